@@ -1,5 +1,6 @@
 /* app.js — MERIDIAN INTEL Dashboard Logic
-   Real-time feed polling (60s), analytics tracking, theme/clock/mobile */
+   Real-time feed push (SSE) with polling fallback (60s), analytics tracking,
+   theme/clock/mobile */
 (function () {
   'use strict';
 
@@ -172,6 +173,11 @@
       li.classList.add('entry-new');
     }
 
+    // Clustered stories list every corroborating source after the first
+    const extraSources = (entry.source_tags || []).slice(1).map(tag =>
+      '<span class="entry-source ' + (SOURCE_CLASS_MAP[tag] || 'media') + '">' + escapeHtml(tag) + '</span>'
+    ).join('');
+
     li.innerHTML =
       '<div class="entry-meta">' +
         '<time class="entry-time" datetime="' + escapeHtml(entry.time || '') + '">' +
@@ -179,6 +185,7 @@
         '</time>' +
         '<span class="entry-tag ' + priorityClass + '">' + escapeHtml(entry.priority || 'ROUTINE').toUpperCase() + '</span>' +
         '<span class="entry-source ' + sourceClass + '">' + escapeHtml(entry.source_tag || 'NEWS') + '</span>' +
+        extraSources +
       '</div>' +
       '<div class="entry-content">' +
         safeContent(entry.content || entry.title || '') +
@@ -214,7 +221,7 @@
       let html = '';
       sourceNames.forEach(name => {
         const s = sourcesStatus[name];
-        const cls = s === 'ok' ? 'online' : s === 'cached' ? 'warning' : 'offline';
+        const cls = s === 'ok' || s === 'idle' ? 'online' : s === 'cached' ? 'warning' : 'offline';
         const label = name.toUpperCase();
         html += '<span class="feed-source-dot ' + cls + '" title="' + label + ': ' + s + '"></span>';
       });
@@ -222,74 +229,126 @@
     }
   }
 
+  // Delta polling state: the server's version cursor, the ETag of the last
+  // response, and the current window of entries keyed by id.
+  let feedCursor = null;
+  let feedETag = null;
+  let feedEntries = new Map();
+  let lastSourcesStatus = null;
+
+  function byTimeDesc(a, b) {
+    return (Date.parse(b.time) || 0) - (Date.parse(a.time) || 0);
+  }
+
   async function fetchFeed() {
     if (fetchInFlight) return;
     fetchInFlight = true;
     updateFeedStatus('loading', null);
 
     try {
-      const res = await fetch(CGI_BIN + '/feed.py', {
+      const headers = { 'Accept': 'application/json' };
+      if (feedETag) headers['If-None-Match'] = feedETag;
+      const query = feedCursor !== null ? '?since=' + encodeURIComponent(feedCursor) : '';
+
+      const res = await fetch(CGI_BIN + '/feed.py' + query, {
         method: 'GET',
-        headers: { 'Accept': 'application/json' },
+        headers: headers,
+        cache: 'no-store',
         signal: AbortSignal.timeout(30000)
       });
 
+      // Nothing changed since the last poll — keep the rendered timeline
+      if (res.status === 304) {
+        updateFeedStatus('ok', lastSourcesStatus);
+        return;
+      }
+
       if (!res.ok) throw new Error('HTTP ' + res.status);
 
       const data = await res.json();
+      applyFeed(data, res.headers.get('ETag'));
 
-      if (!Array.isArray(data.entries) || data.entries.length === 0) {
-        throw new Error('Empty response');
-      }
-
-      // Update timeline
-      const entries = data.entries;
-      const newEntryIds = new Set(entries.map(e => e.id));
+    } catch (err) {
+      console.error('[MERIDIAN] Feed fetch error:', err);
+      updateFeedStatus('error', null);
+      // Don't clear existing entries on error — keep stale data visible,
+      // but ask for a full window next time
+      feedCursor = null;
+      feedETag = null;
+    } finally {
+      fetchInFlight = false;
+      fetchCountdown = 60;
+    }
+  }
 
-      // Clear and rebuild
-      if (timelineList) {
-        // Determine which entries are new
-        const fragment = document.createDocumentFragment();
-        entries.forEach(entry => {
-          const isNew = !lastKnownEntryIds.has(entry.id);
-          fragment.appendChild(createTimelineEntry(entry, isNew));
-        });
+  // Merge a full or delta feed payload (from a poll or a pushed event) into
+  // the window and re-render. Throws if the window ends up empty.
+  function applyFeed(data, etag) {
+    let changed = true;
 
-        timelineList.innerHTML = '';
-        timelineList.appendChild(fragment);
-      }
+    if (data.delta) {
+      (data.removed || []).forEach(id => feedEntries.delete(id));
+      (data.entries || []).forEach(e => feedEntries.set(e.id, e));
+      changed = (data.entries || []).length > 0 || (data.removed || []).length > 0;
+    } else {
+      if (!Array.isArray(data.entries)) throw new Error('Empty response');
+      feedEntries = new Map(data.entries.map(e => [e.id, e]));
+    }
+    feedCursor = typeof data.cursor === 'number' ? data.cursor : null;
+    feedETag = etag;
 
-      // Update entry count
-      if (eventCountEl) {
-        eventCountEl.textContent = String(data.entry_count || entries.length);
-      }
+    if (feedEntries.size === 0) {
+      throw new Error('Empty response');
+    }
 
-      // Update banner + footer timestamps
-      if (data.updated_display) {
-        if (bannerTS) bannerTS.textContent = data.updated_display;
-        if (footerTS) footerTS.textContent = data.updated_display;
-      }
+    const entries = Array.from(feedEntries.values()).sort(byTimeDesc);
+    if (data.entry_count && entries.length > data.entry_count) {
+      entries.length = data.entry_count;
+    }
+    const newEntryIds = new Set(entries.map(e => e.id));
+
+    // Rebuild only when the window actually changed
+    if (timelineList && (changed || isFirstLoad)) {
+      // Determine which entries are new
+      const fragment = document.createDocumentFragment();
+      entries.forEach(entry => {
+        const isNew = !lastKnownEntryIds.has(entry.id);
+        fragment.appendChild(createTimelineEntry(entry, isNew));
+      });
 
-      lastKnownEntryIds = newEntryIds;
+      timelineList.innerHTML = '';
+      timelineList.appendChild(fragment);
+    }
 
-      // Show LIVE if we got entries, PARTIAL if some sources failed
-      const srcStatus = data.sources_status || {};
-      const hasErrors = Object.values(srcStatus).some(s => s.startsWith && s.startsWith('error'));
-      updateFeedStatus(hasErrors ? 'partial' : 'ok', srcStatus);
-      isFirstLoad = false;
+    // Update entry count
+    if (eventCountEl) {
+      eventCountEl.textContent = String(data.entry_count || entries.length);
+    }
 
-    } catch (err) {
-      console.error('[MERIDIAN] Feed fetch error:', err);
-      updateFeedStatus('error', null);
-      // Don't clear existing entries on error — keep stale data visible
-    } finally {
-      fetchInFlight = false;
-      fetchCountdown = 60;
+    // Update banner + footer timestamps
+    if (data.updated_display) {
+      if (bannerTS) bannerTS.textContent = data.updated_display;
+      if (footerTS) footerTS.textContent = data.updated_display;
     }
+
+    lastKnownEntryIds = newEntryIds;
+
+    // Show LIVE if we got entries, PARTIAL if some sources failed
+    const srcStatus = data.sources_status || {};
+    lastSourcesStatus = srcStatus;
+    const hasErrors = Object.values(srcStatus).some(s => s.startsWith && (s.startsWith('error') || s === 'circuit_open'));
+    updateFeedStatus(hasErrors ? 'partial' : 'ok', srcStatus);
+    isFirstLoad = false;
   }
 
   // Countdown timer display
   function tickCountdown() {
+    if (liveStream) {
+      // Updates are pushed; poll only if the stream drops
+      if (nextFetchEl) nextFetchEl.textContent = 'PUSH';
+      fetchCountdown = 60;
+      return;
+    }
     fetchCountdown--;
     if (nextFetchEl) {
       nextFetchEl.textContent = fetchCountdown + 's';
@@ -299,8 +358,40 @@
     }
   }
 
-  // Initial fetch + polling
-  fetchFeed();
+  // ============================================================
+  // PUSH CHANNEL (server.py only; the CGI server has no stream, so
+  // EventSource fails and the pollers keep running)
+  // ============================================================
+  let liveStream = null;
+
+  function openLiveStream() {
+    if (!('EventSource' in window)) return;
+    const es = new EventSource(CGI_BIN + '/events?session_id=' + encodeURIComponent(SESSION_ID));
+
+    es.onopen = () => { liveStream = es; };
+    es.onerror = () => {
+      // Polling covers the gap while EventSource reconnects (or for good,
+      // if it gave up); reconnects resume from the last event id
+      liveStream = null;
+      if (isFirstLoad) fetchFeed();
+    };
+    es.addEventListener('feed', (e) => {
+      try {
+        applyFeed(JSON.parse(e.data), null);
+      } catch (err) {
+        console.error('[MERIDIAN] Feed push error:', err);
+      }
+    });
+    es.addEventListener('summary', (e) => {
+      try {
+        renderAnalytics(JSON.parse(e.data));
+      } catch (err) { /* silent */ }
+    });
+  }
+
+  // Initial load: the stream's first event carries the full window
+  if ('EventSource' in window) openLiveStream();
+  else fetchFeed();
   setInterval(tickCountdown, 1000);
 
   // ============================================================
@@ -331,8 +422,10 @@
     }
   }
 
-  // Send heartbeat every 2 minutes to track active users
+  // Send heartbeat every 2 minutes to track active users (an open push
+  // stream already counts as one)
   async function sendHeartbeat() {
+    if (liveStream) return;
     try {
       await fetch(CGI_BIN + '/analytics.py?action=heartbeat&session_id=' +
                   encodeURIComponent(SESSION_ID));
@@ -341,19 +434,21 @@
 
   // Fetch analytics summary and update UI
   async function fetchAnalytics() {
+    if (liveStream) return;
     try {
       const res = await fetch(CGI_BIN + '/analytics.py?action=summary');
       if (!res.ok) return;
-      const data = await res.json();
-
-      if (analyticsViewsEl) analyticsViewsEl.textContent = formatNumber(data.total_views || 0);
-      if (analyticsTodayEl) analyticsTodayEl.textContent = formatNumber(data.today_views || 0);
-      if (analyticsActiveEl) analyticsActiveEl.textContent = String(data.active_last_5min || 0);
-      if (analyticsSessionsEl) analyticsSessionsEl.textContent = formatNumber(data.unique_sessions_today || 0);
-
+      renderAnalytics(await res.json());
     } catch (e) { /* silent */ }
   }
 
+  function renderAnalytics(data) {
+    if (analyticsViewsEl) analyticsViewsEl.textContent = formatNumber(data.total_views || 0);
+    if (analyticsTodayEl) analyticsTodayEl.textContent = formatNumber(data.today_views || 0);
+    if (analyticsActiveEl) analyticsActiveEl.textContent = String(data.active_last_5min || 0);
+    if (analyticsSessionsEl) analyticsSessionsEl.textContent = formatNumber(data.unique_sessions_today || 0);
+  }
+
   function formatNumber(n) {
     if (n >= 1000000) return (n / 1000000).toFixed(1) + 'M';
     if (n >= 1000) return (n / 1000).toFixed(1) + 'K';
@@ -367,7 +462,7 @@
   // Heartbeat every 2 minutes
   setInterval(sendHeartbeat, 120000);
 
-  // Refresh analytics every 60 seconds (aligned with feed)
+  // Refresh analytics every 60 seconds (aligned with feed) unless pushed
   setInterval(fetchAnalytics, 60000);
 
   // ============================================================
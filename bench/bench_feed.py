@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+MERIDIAN INTEL — Feed pipeline benchmark against a local fake publisher
+
+Starts an HTTP server on 127.0.0.1 that serves generated RSS 2.0 and Atom
+fixtures, points feed_engine.RSS_SOURCES at it and keeps every cache/state file in
+a temporary directory, so nothing touches live publishers or the project's
+own caches. Reports, in milliseconds:
+
+  end_to_end   build_feed(), as a cache-miss refresh runs it
+  network      concurrent download of every fixture body
+  parse        iter_feed_items() over the downloaded bodies
+  filter       the per-item work of fetch_source() (dates, relevance,
+               priority, ids) over the parsed items, with an empty item cache
+  filter_warm  the same with the item cache the previous pass filled, as a
+               refresh of unchanged feeds runs it
+  archive      archive_entries() for one refresh's entries
+  sort         cluster_entries() plus the newest-first window selection
+  cache_hit    the CGI front door (feed.py main()) in-process when
+               feed_cache.body is fresh
+
+The stages are timed one after another on the same data, so they do not add
+up exactly to end_to_end, where downloads and parsing overlap across threads.
+
+A separate merge comparison (skipped with --candidates 0) builds the
+window from --candidates synthetic items both ways: as dict entries with
+preformatted time strings, re-parsed and fully sorted (the old build_feed),
+and as FeedEntry records through a bounded heap with only the window
+formatted (the current one). It reports time and tracemalloc peak for each.
+
+Usage: python bench/bench_feed.py [--sources 5] [--items 50] [--item-bytes 400]
+       [--atom-share 0.4] [--latency 0.05] [--jitter 0.02] [--fail-rate 0]
+       [--hang-rate 0] [--conditional] [--iterations 5] [--hits 200]
+       [--candidates 20000] [--json results.json]
+"""
+
+import argparse
+import heapq
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.request import urlopen
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cgi-bin"))
+import feed as feed_cgi  # noqa: E402
+import feed_engine as feed  # noqa: E402
+
+RELEVANT_TITLES = [
+    "Iran launches missile barrage at {w} as Israel vows retaliation",
+    "IDF airstrike hits {w} depot near Isfahan, officials say",
+    "Hezbollah drone attack on {w} intercepted over northern Israel",
+    "Pentagon moves warship toward Strait of Hormuz after {w} incident",
+]
+OTHER_TITLES = [
+    "Central bank holds rates steady as {w} inflation cools",
+    "Local elections in {w} postponed after heavy flooding",
+    "Award ceremony in {w} honours regional journalists",
+]
+
+
+# ─── Fixtures ─────────────────────────────────────────────────────────────────
+
+def make_items(count, item_bytes, relevant_share, rng):
+    """Newest-first (title, link, description, datetime) tuples in the last 90 minutes."""
+    now = datetime.now(timezone.utc)
+    items = []
+    for i in range(count):
+        word = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(8))
+        template = rng.choice(RELEVANT_TITLES if rng.random() < relevant_share else OTHER_TITLES)
+        title = template.format(w=word.capitalize())
+        filler = " ".join(
+            "".join(rng.choice("abcdefghij") for _ in range(rng.randint(3, 9)))
+            for _ in range(item_bytes // 7)
+        )
+        items.append((title, f"https://publisher.test/{word}/{i}",
+                       f"<p>{title}.</p> {filler}"[:item_bytes],
+                       now - timedelta(seconds=90 * 60 * i / max(count, 1))))
+    return items
+
+
+def rss_document(items):
+    body = "".join(
+        f"<item><title>{escape(t)}</title><link>{escape(l)}</link>"
+        f"<description>{escape(d)}</description><pubDate>{format_datetime(dt)}</pubDate></item>"
+        for t, l, d, dt in items
+    )
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>bench</title>{body}</channel></rss>'.encode()
+
+
+def atom_document(items):
+    body = "".join(
+        f'<entry><title>{escape(t)}</title><link href="{escape(l)}"/>'
+        f"<summary>{escape(d)}</summary><updated>{dt.isoformat()}</updated></entry>"
+        for t, l, d, dt in items
+    )
+    return f'<?xml version="1.0"?><feed xmlns="http://www.w3.org/2005/Atom"><title>bench</title>{body}</feed>'.encode()
+
+
+# ─── Fake publisher ───────────────────────────────────────────────────────────
+
+class Publisher(ThreadingHTTPServer):
+    """Serves /feed/<n> from `documents` with the configured latency and failures."""
+
+    daemon_threads = True
+
+    def __init__(self, documents, args):
+        super().__init__(("127.0.0.1", 0), PublisherHandler)
+        self.documents = documents
+        self.args = args
+        self.rng = random.Random(7)
+        self.requests = 0
+
+
+class PublisherHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server, args = self.server, self.server.args
+        server.requests += 1
+        time.sleep(args.latency + server.rng.uniform(0, args.jitter))
+        roll = server.rng.random()
+        if roll < args.fail_rate:
+            self.send_error(500)
+            return
+        if roll < args.fail_rate + args.hang_rate:
+            time.sleep(feed.FETCH_DEADLINE + 1)
+        try:
+            body = server.documents[int(self.path.rsplit("/", 1)[-1])]
+        except (ValueError, IndexError):
+            self.send_error(404)
+            return
+        etag = f'"{hash(body) & 0xFFFFFFFF:x}"'
+        if args.conditional and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/xml")
+        self.send_header("Content-Length", str(len(body)))
+        if args.conditional:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+# ─── Stages ───────────────────────────────────────────────────────────────────
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def download_all(urls):
+    """Fetch every URL on its own thread, like fetch_all_sources(). Returns the bodies."""
+    bodies = [b""] * len(urls)
+
+    def worker(i, url):
+        try:
+            with urlopen(url, timeout=feed.FETCH_TIMEOUT) as resp:
+                bodies[i] = resp.read()
+        except Exception:
+            pass
+
+    threads = [threading.Thread(target=worker, args=(i, u), daemon=True) for i, u in enumerate(urls)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(feed.FETCH_DEADLINE)
+    return bodies
+
+
+def parse_all(bodies):
+    parsed = []
+    for body in bodies:
+        if body:
+            parsed.append(list(feed.iter_feed_items(io.BytesIO(body), raw=True)))
+    return parsed
+
+
+def filter_all(parsed, item_cache):
+    """The per-item work of fetch_source(), minus the network and the early stop."""
+    now = int(time.time())
+    cutoff = now - 2 * 3600
+    entries = []
+    for items in parsed:
+        for item in items:
+            key = feed.item_key(item)
+            result = item_cache.get(key)
+            if result is None:
+                result = item_cache[key] = [now, *feed.process_item(item, cutoff)]
+            else:
+                result[0] = now
+            _, pub_ts, entry_id, priority, title, content = result
+            if entry_id is None or (pub_ts is not None and pub_ts < cutoff):
+                continue
+            entries.append(feed.FeedEntry(entry_id, pub_ts if pub_ts is not None else now, priority,
+                                          "BENCH", "media", title, content))
+    return entries
+
+
+def cluster_and_sort(entries):
+    entries = feed.cluster_entries(entries)
+    window = heapq.nlargest(feed.FEED_WINDOW, entries, key=lambda e: e.ts)
+    return [e.to_dict() for e in window]
+
+
+# ─── Merge comparison ─────────────────────────────────────────────────────────
+
+def make_candidates(count, sources, rng):
+    """(id, epoch, priority, tag, title, content) tuples spread over the last two hours."""
+    now = int(time.time())
+    return [
+        (f"c{i:07d}", now - rng.randrange(7200), rng.choice(["flash", "priority", "routine"]),
+         f"PUB{i % sources}", f"Candidate headline {i}", f"Candidate body {i} " + "x" * 200)
+        for i in range(count)
+    ]
+
+
+def merge_dicts(candidates):
+    """The old path: dict entries with both time strings, every one re-parsed and sorted."""
+    entries = []
+    for entry_id, ts, priority, tag, title, content in candidates:
+        dt = datetime.fromtimestamp(ts, feed.IST)
+        entries.append({
+            "id": entry_id,
+            "time": dt.isoformat(),
+            "time_display": feed.format_display(dt),
+            "priority": priority,
+            "source_tag": tag,
+            "source_class": "media",
+            "title": title,
+            "content": content,
+        })
+    entries.sort(key=lambda e: datetime.fromisoformat(e["time"]), reverse=True)
+    return entries[:feed.FEED_WINDOW]
+
+
+def merge_records(candidates):
+    """The current path: FeedEntry records, heap top-K, only the window formatted."""
+    entries = [feed.FeedEntry(entry_id, ts, priority, tag, "media", title, content)
+               for entry_id, ts, priority, tag, title, content in candidates]
+    window = heapq.nlargest(feed.FEED_WINDOW, entries, key=lambda e: e.ts)
+    return [e.to_dict() for e in window]
+
+
+def measure_merge(fn, candidates, iterations):
+    """(median ms, tracemalloc peak bytes) of fn(candidates)."""
+    ms = statistics.median(timed(fn, candidates)[1] for _ in range(iterations))
+    tracemalloc.start()
+    try:
+        fn(candidates)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return ms, peak
+
+
+def cache_hit():
+    """One in-process feed.py main() call served from feed_cache.body."""
+    real_stdout = sys.stdout
+    sys.stdout = io.TextIOWrapper(io.BytesIO(), encoding="utf-8")
+    try:
+        feed_cgi.main()
+    finally:
+        sys.stdout = real_stdout
+
+
+# ─── Driver ───────────────────────────────────────────────────────────────────
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "min": round(ordered[0], 3),
+        "median": round(statistics.median(ordered), 3),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        "mean": round(statistics.fmean(ordered), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sources", type=int, default=5)
+    parser.add_argument("--items", type=int, default=50, help="items per feed")
+    parser.add_argument("--item-bytes", type=int, default=400, help="description length")
+    parser.add_argument("--relevant-share", type=float, default=0.5)
+    parser.add_argument("--atom-share", type=float, default=0.4, help="share of sources served as Atom")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before each response")
+    parser.add_argument("--jitter", type=float, default=0.02, help="extra random latency, seconds")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered 500")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="share of requests stalled past FETCH_DEADLINE")
+    parser.add_argument("--conditional", action="store_true", help="send ETags, so repeat fetches get 304")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--hits", type=int, default=200, help="cache-hit main() calls")
+    parser.add_argument("--candidates", type=int, default=20000,
+                        help="synthetic items for the merge comparison (0 skips it)")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    documents = []
+    for i in range(args.sources):
+        items = make_items(args.items, args.item_bytes, args.relevant_share, rng)
+        documents.append(atom_document(items) if i < args.sources * args.atom_share else rss_document(items))
+
+    tmp = tempfile.mkdtemp(prefix="meridian-bench-")
+    for name, filename in (("CACHE_FILE", "feed_cache.json"), ("LOCK_FILE", "feed_cache.lock"),
+                           ("BODY_CACHE_FILE", "feed_cache.body"), ("SOURCE_STATE_FILE", "feed_sources.json"),
+                           ("ITEM_CACHE_FILE", "feed_items.json"),
+                           ("ARCHIVE_DB", "feed_archive.db"), ("METRICS_LOG_FILE", "feed_metrics.log"),
+                           ("METRICS_STATE_FILE", "feed_metrics.json")):
+        setattr(feed, name, os.path.join(tmp, filename))
+    feed_cgi.BODY_CACHE_FILE = feed.BODY_CACHE_FILE
+    feed_cgi.METRICS_LOG_FILE = feed.METRICS_LOG_FILE
+    os.environ.pop("QUERY_STRING", None)
+    os.environ.pop("HTTP_IF_NONE_MATCH", None)
+
+    server = Publisher(documents, args)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = [f"{base}/feed/{i}" for i in range(args.sources)]
+    feed.RSS_SOURCES = [{"key": f"pub{i}", "tag": f"PUB{i}", "urls": [u]} for i, u in enumerate(urls)]
+    feed.POLL_MIN = 0  # poll every source on every refresh, not on the adaptive schedule
+
+    samples = {k: [] for k in ("end_to_end", "network", "parse", "filter", "filter_warm", "archive", "sort")}
+    statuses = {}
+    try:
+        previous = None
+        for _ in range(args.iterations):
+            if not args.conditional:
+                try:
+                    os.remove(feed.SOURCE_STATE_FILE)
+                except FileNotFoundError:
+                    pass
+            previous, ms = timed(feed.build_feed, previous)
+            samples["end_to_end"].append(ms)
+            for status in previous["sources_status"].values():
+                statuses[status.split(":")[0]] = statuses.get(status.split(":")[0], 0) + 1
+
+            bodies, ms = timed(download_all, urls)
+            samples["network"].append(ms)
+            parsed, ms = timed(parse_all, bodies)
+            samples["parse"].append(ms)
+            item_cache = {}
+            entries, ms = timed(filter_all, parsed, item_cache)
+            samples["filter"].append(ms)
+            _, ms = timed(filter_all, parsed, item_cache)
+            samples["filter_warm"].append(ms)
+            _, ms = timed(feed.archive_entries, entries)
+            samples["archive"].append(ms)
+            _, ms = timed(cluster_and_sort, entries)
+            samples["sort"].append(ms)
+
+        feed.save_cache(previous)
+        samples["cache_hit"] = [timed(cache_hit)[1] for _ in range(args.hits)]
+    finally:
+        server.shutdown()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    results = {name: summarize(values) for name, values in samples.items() if values}
+    print(f"{'stage':<11} {'median ms':>10} {'p95 ms':>9} {'min ms':>9}")
+    for name, r in results.items():
+        print(f"{name:<11} {r['median']:>10.2f} {r['p95']:>9.2f} {r['min']:>9.2f}")
+    print(f"source statuses: {statuses}; entries in window: {previous['entry_count']}")
+
+    merge = {}
+    if args.candidates:
+        candidates = make_candidates(args.candidates, max(args.sources, 1), rng)
+        if [e["id"] for e in merge_dicts(candidates)] != [e["id"] for e in merge_records(candidates)]:
+            raise SystemExit("merge comparison: the two paths chose different windows")
+        for name, fn in (("dict_sort", merge_dicts), ("record_heap", merge_records)):
+            ms, peak = measure_merge(fn, candidates, args.iterations)
+            merge[name] = {"median_ms": round(ms, 2), "peak_kib": round(peak / 1024, 1)}
+        print(f"merge of {args.candidates} candidates into {feed.FEED_WINDOW}:")
+        for name, r in merge.items():
+            print(f"  {name:<12} {r['median_ms']:>9.2f} ms {r['peak_kib']:>10.1f} KiB peak")
+
+    if args.json:
+        report = {
+            "benchmark": "bench_feed",
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "config": vars(args),
+            "fixture_bytes": sum(len(d) for d in documents),
+            "source_statuses": statuses,
+            "results_ms": results,
+            "merge": merge,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+MERIDIAN INTEL — Keyword matcher micro-benchmark
+
+Compares the per-item cost of the old substring loop (one `kw in text` per
+keyword) with feed_engine.KeywordMatcher as the keyword list grows. The
+matcher's cost should stay flat; the loop's grows linearly with the keyword
+count.
+
+Usage: python bench/bench_keywords.py [--items 2000] [--sizes 30,300,3000]
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cgi-bin"))
+import feed_engine as feed  # noqa: E402
+
+SAMPLE_TEXTS = [
+    "Israeli airstrikes hit targets near Isfahan as Iran vows retaliation",
+    "Award ceremony in Warsaw honours journalists covering the conflict",
+    "Oil prices climb after tanker diverted away from the Strait of Hormuz",
+    "Pentagon confirms additional carrier group heading to the Middle East",
+    "Local elections postponed after heavy flooding in the northern region",
+    "Hezbollah fires rockets into northern Israel; IDF responds with artillery",
+    "Central bank holds interest rates steady amid inflation concerns",
+    "Houthi drones target commercial shipping in the Red Sea, officials say",
+]
+
+
+def synthetic_keywords(count, rng):
+    """The real keyword list padded with random one- and two-word terms."""
+    words = list(feed.KEYWORDS)
+    while len(words) < count:
+        n = rng.choice((1, 1, 1, 2))
+        words.append(" ".join(
+            "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10)))
+            for _ in range(n)
+        ))
+    return words[:count]
+
+
+def make_items(count, rng):
+    """Title + description strings of realistic length."""
+    return [
+        rng.choice(SAMPLE_TEXTS) + " " + " ".join(rng.sample(SAMPLE_TEXTS, 3))
+        for _ in range(count)
+    ]
+
+
+def substring_loop(keywords, text):
+    t = text.lower()
+    return [kw for kw in keywords if kw in t]
+
+
+def time_per_item(fn, items, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in items:
+            fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best / len(items) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--sizes", default="30,100,300,1000,3000")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    items = make_items(args.items, rng)
+    sizes = [int(x) for x in args.sizes.split(",")]
+
+    print(f"{'keywords':>9}  {'substring µs/item':>18}  {'matcher µs/item':>16}")
+    for size in sizes:
+        keywords = synthetic_keywords(size, rng)
+        matcher = feed.KeywordMatcher(keywords)
+        loop_us = time_per_item(lambda t: substring_loop(keywords, t), items)
+        match_us = time_per_item(matcher.find, items)
+        print(f"{size:>9}  {loop_us:>18.2f}  {match_us:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+MERIDIAN INTEL — CGI cold-start benchmark
+
+Every CGI request starts a fresh interpreter, so what a script imports and
+builds before answering is paid on every hit. This runs the hot paths as a
+CGI server would, one process per request, against a temporary copy of
+cgi-bin/ (byte-compiled, warm feed cache, migrated analytics database),
+and reports per path:
+
+  feed_hit        GET feed.py served from a fresh feed_cache.body
+  feed_304        the same with a matching If-None-Match
+  analytics_post  POST analytics.py pageview (spooled, no drain due)
+  heartbeat       GET analytics.py?action=heartbeat (spooled)
+
+with the bare interpreter (python -c pass) as the floor. Wall times are
+medians over --runs processes; "over floor" subtracts the floor. One extra
+run per path under -X importtime lists the modules it imported.
+
+--check enforces the budget below and exits 1 on a breach: no path may
+import a module from its forbidden list (deterministic), and none may take
+more than its budget in ms over the floor (scaled by --budget-scale for
+slow machines).
+
+Usage: python bench/bench_startup.py [--runs 20] [--check] [--budget-scale 1]
+       [--top 8] [--json results.json]
+"""
+
+import argparse
+import compileall
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CGI_DIR = os.path.join(BENCH_DIR, "..", "cgi-bin")
+
+# path -> (ms over the interpreter floor, modules the path must not import)
+BUDGETS = {
+    "feed_hit": (15, ["feed_engine", "json", "re", "gzip", "hashlib", "socket", "sqlite3",
+                      "email.utils", "urllib.parse", "urllib.request", "xml.etree.ElementTree"]),
+    "feed_304": (15, ["feed_engine", "json", "re", "gzip", "hashlib", "socket", "sqlite3",
+                      "email.utils", "urllib.parse", "urllib.request", "xml.etree.ElementTree"]),
+    "analytics_post": (30, ["sqlite3", "hashlib", "uuid"]),
+    "heartbeat": (30, ["sqlite3", "hashlib", "uuid", "urllib.parse"]),
+}
+
+PAGEVIEW = {
+    "event": "pageview",
+    "path": "/",
+    "referrer": "https://news.ycombinator.com/item?id=1",
+    "user_agent": "bench_startup",
+    "screen_width": 1280,
+    "session_id": "bench-startup",
+}
+
+
+def load_module(path, name):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def prepare(project):
+    """Copy cgi-bin/ into `project` and warm the feed cache and analytics database."""
+    cgi_bin = os.path.join(project, "cgi-bin")
+    shutil.copytree(CGI_DIR, cgi_bin, ignore=shutil.ignore_patterns("__pycache__"))
+    # As a deploy would: the CGI user may not be able to write __pycache__
+    compileall.compile_dir(cgi_bin, quiet=1)
+
+    engine = load_module(os.path.join(cgi_bin, "feed_engine.py"), "bench_feed_engine")
+    now = engine.now_ist()
+    engine.save_cache({
+        "status": "ok",
+        "updated": now.isoformat(),
+        "updated_display": engine.format_display(now),
+        "entry_count": len(engine.BASELINE_ENTRIES),
+        "entries": engine.BASELINE_ENTRIES,
+        "sources_status": {s["key"]: "ok" for s in engine.RSS_SOURCES},
+        "cursor": 1,
+    })
+    etag = next(line for line in cgi_request(cgi_bin, "feed_hit")[1].splitlines()
+                if line.lower().startswith("etag:")).split(":", 1)[1].strip()
+
+    # First POST creates and migrates analytics.db; its drain empties the spool
+    cgi_request(cgi_bin, "analytics_post")
+    return cgi_bin, etag
+
+
+def cgi_env(kind, etag=None):
+    env = dict(os.environ, GATEWAY_INTERFACE="CGI/1.1", SERVER_PROTOCOL="HTTP/1.1")
+    for key in ("QUERY_STRING", "HTTP_IF_NONE_MATCH", "CONTENT_LENGTH"):
+        env.pop(key, None)
+    body = b""
+    if kind in ("feed_hit", "feed_304"):
+        env.update(REQUEST_METHOD="GET", QUERY_STRING="", HTTP_ACCEPT_ENCODING="gzip")
+        if kind == "feed_304":
+            env["HTTP_IF_NONE_MATCH"] = etag
+        return "feed.py", env, body
+    if kind == "analytics_post":
+        body = json.dumps(PAGEVIEW).encode("utf-8")
+        env.update(REQUEST_METHOD="POST", QUERY_STRING="", CONTENT_LENGTH=str(len(body)),
+                   CONTENT_TYPE="application/json")
+    else:
+        env.update(REQUEST_METHOD="GET", QUERY_STRING="action=heartbeat&session_id=bench-startup")
+    return "analytics.py", env, body
+
+
+def cgi_request(cgi_bin, kind, etag=None, flags=()):
+    """Run one request. Returns (wall_ms, stdout text, stderr text)."""
+    if kind == "floor":
+        cmd, env, body = [sys.executable, *flags, "-c", "pass"], None, b""
+    else:
+        script, env, body = cgi_env(kind, etag)
+        cmd = [sys.executable, *flags, os.path.join(cgi_bin, script)]
+        if kind in ("analytics_post", "heartbeat"):
+            # Mark a drain as just done, so the request only appends to the spool
+            lock = os.path.join(cgi_bin, "..", "analytics_spool.lock")
+            if os.path.exists(lock):
+                os.utime(lock)
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, input=body, env=env, capture_output=True, cwd=cgi_bin)
+    ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise SystemExit(f"{kind} failed:\n{proc.stderr.decode('utf-8', errors='replace')}")
+    return ms, proc.stdout.decode("latin-1"), proc.stderr.decode("utf-8", errors="replace")
+
+
+def parse_importtime(stderr):
+    """-X importtime lines -> [(module, self_us, cumulative_us)]."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20, help="processes per path")
+    parser.add_argument("--check", action="store_true", help="exit 1 if a path breaks its budget")
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="multiply the ms budgets")
+    parser.add_argument("--top", type=int, default=8, help="slowest imports listed per path")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    project = tempfile.mkdtemp(prefix="meridian-startup-")
+    try:
+        cgi_bin, etag = prepare(project)
+        floor_modules = {name for name, _, _ in parse_importtime(
+            cgi_request(cgi_bin, "floor", flags=("-X", "importtime"))[2])}
+
+        results = {}
+        for kind in ["floor", *BUDGETS]:
+            cgi_request(cgi_bin, kind, etag)  # warm-up: fills the OS page cache
+            wall = sorted(cgi_request(cgi_bin, kind, etag)[0] for _ in range(args.runs))
+            imports = parse_importtime(cgi_request(cgi_bin, kind, etag, flags=("-X", "importtime"))[2])
+            imported = [m for m in imports if m[0] not in floor_modules]
+            results[kind] = {
+                "median_ms": round(statistics.median(wall), 2),
+                "p90_ms": round(wall[min(len(wall) - 1, int(len(wall) * 0.9))], 2),
+                "min_ms": round(wall[0], 2),
+                "modules": len(imported),
+                "import_ms": round(sum(m[1] for m in imported) / 1000, 2),
+                "slowest_imports": [[name, round(cum / 1000, 2)] for name, _, cum in
+                                    sorted(imported, key=lambda m: -m[2])[:args.top]],
+                "imported": sorted(m[0] for m in imported),
+            }
+    finally:
+        shutil.rmtree(project, ignore_errors=True)
+
+    floor = results["floor"]["median_ms"]
+    failures = []
+    print(f"{'path':<15} {'median ms':>10} {'p90 ms':>8} {'over floor':>11} {'budget':>7} "
+          f"{'modules':>8} {'import ms':>10}")
+    for kind, r in results.items():
+        over = round(r["median_ms"] - floor, 2)
+        budget = ""
+        if kind in BUDGETS:
+            limit, forbidden = BUDGETS[kind]
+            limit *= args.budget_scale
+            r["over_floor_ms"] = over
+            r["budget_ms"] = limit
+            r["forbidden_imported"] = sorted(set(forbidden) & set(r["imported"]))
+            budget = f"{limit:g}"
+            if over > limit:
+                failures.append(f"{kind}: {over:.1f} ms over the floor, budget {limit:g} ms")
+            if r["forbidden_imported"]:
+                failures.append(f"{kind}: imports {', '.join(r['forbidden_imported'])}")
+        print(f"{kind:<15} {r['median_ms']:>10.1f} {r['p90_ms']:>8.1f} "
+              f"{'' if kind == 'floor' else f'{over:.1f}':>11} {budget:>7} "
+              f"{r['modules']:>8} {r['import_ms']:>10.1f}")
+    for kind, r in results.items():
+        if r["slowest_imports"]:
+            print(f"  {kind}: " + ", ".join(f"{name} {ms:.1f}" for name, ms in r["slowest_imports"]))
+
+    if args.json:
+        report = {
+            "benchmark": "bench_startup",
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "config": vars(args),
+            "results": results,
+            "failures": failures,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.json}")
+
+    if failures:
+        print("budget exceeded:\n  " + "\n  ".join(failures))
+        if args.check:
+            sys.exit(1)
+    elif args.check:
+        print("all paths within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+MERIDIAN INTEL — Concurrent-writer load test for analytics.py
+
+Runs analytics.py exactly as a CGI server does: one process per request,
+with REQUEST_METHOD / QUERY_STRING / CONTENT_LENGTH in the environment and
+the POST body on stdin. A mix of pageview POSTs, heartbeats and summary
+GETs is issued from --concurrency parallel workers, either as fast as they
+can go or paced to --rate requests per second.
+
+The script under test (and the analytics_engine.py beside it) is copied
+into a temporary project directory, so its analytics.db, spool and archive
+files are created there and the project's own database is never touched.
+Pass --script to load-test another revision of analytics.py against the
+same workload.
+
+Reports throughput, p50/p95/p99 latency per request kind, the share of
+responses that failed on a locked database (or failed at all), and how much
+the database files grew per recorded event.
+
+Usage: python bench/loadtest_analytics.py [--concurrency 16] [--duration 10]
+       [--rate 0] [--mix post=0.7,heartbeat=0.25,summary=0.05] [--sessions 500]
+       [--script cgi-bin/analytics.py] [--json results.json] [--keep]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SCRIPT = os.path.join(BENCH_DIR, "..", "cgi-bin", "analytics.py")
+
+PATHS = ["/", "/", "/", "/?tab=feed", "/?tab=map", "/about"]
+REFERRERS = ["", "", "https://t.co/abc", "https://www.google.com/search?q=iran", "https://news.ycombinator.com/item?id=1"]
+WIDTHS = [390, 414, 768, 1024, 1280, 1920]
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        kind, _, share = part.partition("=")
+        mix[kind.strip()] = float(share)
+    unknown = set(mix) - {"post", "heartbeat", "summary"}
+    if unknown:
+        raise SystemExit(f"unknown request kinds in --mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def db_bytes(project_dir):
+    """Total size of every analytics file the script keeps in its project dir."""
+    total = 0
+    for root, _dirs, files in os.walk(project_dir):
+        for name in files:
+            if name.startswith("analytics"):
+                total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def cgi_request(script, kind, rng, sessions):
+    """Run one CGI request. Returns (latency_ms, outcome) with outcome ok/locked/error."""
+    env = dict(os.environ, GATEWAY_INTERFACE="CGI/1.1", SERVER_PROTOCOL="HTTP/1.1")
+    session_id = f"load-{rng.randrange(sessions)}"
+    body = b""
+    if kind == "post":
+        body = json.dumps({
+            "event": "pageview",
+            "path": rng.choice(PATHS),
+            "referrer": rng.choice(REFERRERS),
+            "user_agent": "loadtest",
+            "screen_width": rng.choice(WIDTHS),
+            "session_id": session_id,
+        }).encode("utf-8")
+        env.update(REQUEST_METHOD="POST", QUERY_STRING="", CONTENT_LENGTH=str(len(body)),
+                   CONTENT_TYPE="application/json")
+    elif kind == "heartbeat":
+        env.update(REQUEST_METHOD="GET", QUERY_STRING=f"action=heartbeat&session_id={session_id}")
+    else:
+        env.update(REQUEST_METHOD="GET", QUERY_STRING="action=summary")
+
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, script], input=body, env=env, capture_output=True)
+    latency = (time.perf_counter() - start) * 1000
+
+    text = proc.stdout.decode("utf-8", errors="replace")
+    _headers, _, payload = text.partition("\n\n")
+    try:
+        result = json.loads(payload)
+    except ValueError:
+        return latency, "error"
+    if proc.returncode != 0 or result.get("status") == "error":
+        return latency, "locked" if "locked" in str(result.get("error", "")) else "error"
+    return latency, "ok"
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def summarize(latencies):
+    ordered = sorted(latencies)
+    return {
+        "n": len(ordered),
+        "p50": round(percentile(ordered, 0.50), 2),
+        "p95": round(percentile(ordered, 0.95), 2),
+        "p99": round(percentile(ordered, 0.99), 2),
+        "max": round(ordered[-1], 2),
+        "mean": round(statistics.fmean(ordered), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=16, help="parallel CGI processes")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to run")
+    parser.add_argument("--rate", type=float, default=0, help="requests/second across all workers (0 = unpaced)")
+    parser.add_argument("--mix", default="post=0.7,heartbeat=0.25,summary=0.05")
+    parser.add_argument("--sessions", type=int, default=500, help="distinct session ids")
+    parser.add_argument("--script", default=DEFAULT_SCRIPT, help="analytics.py to test")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary project dir")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    kinds, weights = list(mix), list(mix.values())
+
+    project = tempfile.mkdtemp(prefix="meridian-loadtest-")
+    os.makedirs(os.path.join(project, "cgi-bin"))
+    script = os.path.join(project, "cgi-bin", "analytics.py")
+    shutil.copy(args.script, script)
+    engine = os.path.join(os.path.dirname(os.path.abspath(args.script)), "analytics_engine.py")
+    if os.path.exists(engine):
+        shutil.copy(engine, os.path.join(project, "cgi-bin"))
+
+    lock = threading.Lock()
+    latencies = {kind: [] for kind in kinds}
+    outcomes = {"ok": 0, "locked": 0, "error": 0}
+    counter = [0]
+    start = time.perf_counter()
+    stop_at = start + args.duration
+
+    def worker(seed):
+        rng = random.Random(seed)
+        while True:
+            with lock:
+                index = counter[0]
+                counter[0] += 1
+            if args.rate > 0:
+                due = start + index / args.rate
+                if due >= stop_at:
+                    return
+                time.sleep(max(0.0, due - time.perf_counter()))
+            elif time.perf_counter() >= stop_at:
+                return
+            kind = rng.choices(kinds, weights)[0]
+            latency, outcome = cgi_request(script, kind, rng, args.sessions)
+            with lock:
+                latencies[kind].append(latency)
+                outcomes[outcome] += 1
+
+    size_before = db_bytes(project)
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    size_after = db_bytes(project)
+
+    total = sum(outcomes.values())
+    recorded = len(latencies.get("post", [])) + len(latencies.get("heartbeat", []))
+    every = [ms for values in latencies.values() for ms in values]
+    results = {
+        "requests": total,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(total / elapsed, 1) if elapsed else 0,
+        "outcomes": outcomes,
+        "lock_error_rate": round(outcomes["locked"] / total, 4) if total else 0,
+        "error_rate": round((outcomes["locked"] + outcomes["error"]) / total, 4) if total else 0,
+        "latency_ms": {kind: summarize(values) for kind, values in latencies.items() if values},
+        "db_growth_bytes": size_after - size_before,
+        "db_bytes_per_event": round((size_after - size_before) / recorded, 1) if recorded else 0,
+    }
+    if every:
+        results["latency_ms"]["all"] = summarize(every)
+
+    print(f"{total} requests in {elapsed:.1f}s = {results['throughput_rps']} req/s "
+          f"({args.concurrency} workers{f', paced at {args.rate}/s' if args.rate else ''})")
+    print(f"{'kind':<10} {'n':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for kind, r in results["latency_ms"].items():
+        print(f"{kind:<10} {r['n']:>6} {r['p50']:>8.1f} {r['p95']:>8.1f} {r['p99']:>8.1f} {r['max']:>8.1f}")
+    print(f"lock errors: {outcomes['locked']} ({results['lock_error_rate']:.2%}), "
+          f"other errors: {outcomes['error']}")
+    print(f"db growth: {results['db_growth_bytes']} bytes ({results['db_bytes_per_event']} bytes/event)")
+
+    if args.json:
+        report = {
+            "benchmark": "loadtest_analytics",
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "config": dict(vars(args), mix=mix),
+            "results": results,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.json}")
+
+    if args.keep:
+        print(f"project dir kept at {project}")
+    else:
+        shutil.rmtree(project, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
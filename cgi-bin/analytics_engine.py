@@ -0,0 +1,874 @@
+#!/usr/bin/env python3
+"""
+MERIDIAN INTEL — Analytics Tracking & Reporting engine
+Imported by the CGI endpoint cgi-bin/analytics.py and by server.py.
+
+POST: Record a pageview or event.
+GET ?action=summary: Return analytics summary.
+GET ?action=heartbeat&session_id=xxx: Record active-user heartbeat.
+GET ?action=export&token=xxx&from=...&to=...&format=ndjson|csv: Stream raw events.
+
+CLI: python analytics.py retention — partition, downsample and vacuum
+(run from cron; never reachable over CGI).
+CLI: python analytics.py migrate — apply pending schema migrations.
+
+A pageview or heartbeat only appends to the spool, so sqlite3, hashlib, uuid
+and urllib.parse are imported where they are first needed.
+"""
+
+import json
+import math
+import os
+import sys
+import time
+from datetime import datetime, timezone, timedelta
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: no spool, events are written directly
+    fcntl = None
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.join(SCRIPT_DIR, "..")
+DB_PATH = os.path.join(PROJECT_DIR, "analytics.db")
+
+# Ingestion appends one JSON line per event to the spool; whichever process
+# next finds the spool big or old enough drains it into SQLite in a single
+# transaction (group commit), so writers never queue on the database lock.
+# A drain first renames the spool to DRAIN_PATH and deletes that file only
+# once its events are committed; a drain killed part-way leaves the file for
+# the next one, which skips it if the commit had already happened. A drain
+# file that fails for a reason other than the database being unavailable is
+# moved to FAILED_DRAIN_PATH, so one bad event cannot hold up the rest.
+SPOOL_PATH = os.path.join(PROJECT_DIR, "analytics_spool.ndjson")
+DRAIN_PATH = os.path.join(PROJECT_DIR, "analytics_spool.draining")
+FAILED_DRAIN_PATH = os.path.join(PROJECT_DIR, "analytics_spool.failed-{}")
+DRAIN_LOCK_PATH = os.path.join(PROJECT_DIR, "analytics_spool.lock")
+SPOOL_FLUSH_BYTES = 64 * 1024   # drain once the spool holds this much
+SPOOL_FLUSH_INTERVAL = 1.0      # ...or once the last drain is this old (seconds)
+DB_TIMEOUT = 10                 # seconds to wait for the SQLite write lock
+DRAIN_TIMEOUT = 0.25            # ...when draining inside a request; busy means try later
+SCREEN_WIDTH_MAX = 100000       # larger reported widths are clamped to this
+
+# Retention: raw events stay in analytics.db for HOT_DAYS, then move to one
+# database file per day under ARCHIVE_DIR, which is deleted as a unit once it
+# is older than RAW_RETENTION_DAYS. The daily rollups keep the aggregates.
+ARCHIVE_DIR = os.path.join(PROJECT_DIR, "analytics_archive")
+RETENTION_LOCK_PATH = os.path.join(PROJECT_DIR, "analytics_retention.lock")
+HOT_DAYS = 2                 # today and yesterday stay in the main file
+RAW_RETENTION_DAYS = 90      # day partitions older than this are dropped
+HOURLY_RETENTION_DAYS = 30   # hourly rollups older than this are dropped
+RETENTION_BATCH = 5000       # rows moved per transaction
+VACUUM_PAGES = 1000          # pages freed per incremental_vacuum step
+
+# Export streams raw events from the day partitions and the main file in
+# (timestamp, id) order, one keyset page at a time, so memory stays flat and
+# each page is a short read that never holds up ingestion (WAL). It is off
+# unless a token is configured, and requests must pass it as token=. The
+# token comes from the environment, or from a file the environment names;
+# never from the project directory, which the web server serves as is.
+EXPORT_TOKEN_ENV = "MERIDIAN_EXPORT_TOKEN"
+EXPORT_TOKEN_FILE_ENV = "MERIDIAN_EXPORT_TOKEN_FILE"
+EXPORT_COLUMNS = ["id", "timestamp", "event", "path", "referrer", "user_agent", "screen_width", "country", "session_id"]
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson; charset=utf-8", "csv": "text/csv; charset=utf-8"}
+EXPORT_PAGE_ROWS = 1000          # rows per keyset query
+EXPORT_CHUNK_BYTES = 64 * 1024   # output is written in pieces of about this size
+
+CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS events (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    event        TEXT    DEFAULT 'pageview',
+    path         TEXT    DEFAULT '/',
+    referrer     TEXT,
+    user_agent   TEXT,
+    screen_width INTEGER,
+    country      TEXT,
+    timestamp    TEXT    DEFAULT (datetime('now')),
+    session_id   TEXT
+);
+"""
+
+CREATE_INDEX_SQL = """
+CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events (timestamp);
+"""
+
+# One row per session (schema v2-v5; the sketches replaced it).
+CREATE_SESSIONS_SQL = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    first_seen TEXT NOT NULL,
+    last_seen  TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+CREATE_SESSIONS_INDEX_SQL = """
+CREATE INDEX IF NOT EXISTS idx_sessions_last_seen ON sessions (last_seen);
+"""
+
+# Rollups are maintained by ingest() in the same transaction as the raw rows,
+# so the summary reads a bounded number of precomputed rows. Hours and days
+# are IST, keyed by timestamp prefix ("YYYY-MM-DDTHH" and "YYYY-MM-DD").
+CREATE_ROLLUPS_SQL = """
+CREATE TABLE IF NOT EXISTS rollup_hourly (
+    hour    TEXT PRIMARY KEY,
+    views   INTEGER NOT NULL DEFAULT 0,
+    desktop INTEGER NOT NULL DEFAULT 0,
+    tablet  INTEGER NOT NULL DEFAULT 0,
+    mobile  INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_daily (
+    day     TEXT PRIMARY KEY,
+    views   INTEGER NOT NULL DEFAULT 0,
+    desktop INTEGER NOT NULL DEFAULT 0,
+    tablet  INTEGER NOT NULL DEFAULT 0,
+    mobile  INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+"""
+
+UPSERT_ROLLUP_SQL = """INSERT INTO {table} ({key}, views, desktop, tablet, mobile) VALUES (?, ?, ?, ?, ?) ON CONFLICT ({key}) DO UPDATE SET views = views + excluded.views, desktop = desktop + excluded.desktop, tablet = tablet + excluded.tablet, mobile = mobile + excluded.mobile"""
+UPSERT_HOURLY_SQL = UPSERT_ROLLUP_SQL.format(table="rollup_hourly", key="hour")
+UPSERT_DAILY_SQL = UPSERT_ROLLUP_SQL.format(table="rollup_daily", key="day")
+
+DEVICE_COLUMNS = {"desktop": 1, "tablet": 2, "mobile": 3}  # index into a rollup row [views, desktop, tablet, mobile]
+
+# HyperLogLog sketches of session ids, merged register-wise for any window:
+# minute buckets (pruned after MINUTE_SKETCH_MINUTES) serve the active count,
+# hour buckets (pruned with the hourly rollups) serve windows of hours such as
+# the last 24, and day buckets serve today and the last 7 days. With 2**HLL_P one-byte
+# registers the standard error is 1.04 / sqrt(4096) ~= 1.6%, so about 95% of
+# estimates fall within +/-3.3% of the true count; small counts use linear
+# counting and are close to exact.
+HLL_P = 12
+HLL_M = 1 << HLL_P
+HLL_ALPHA = 0.7213 / (1 + 1.079 / HLL_M)
+HLL_POW = [2.0 ** -r for r in range(66)]
+MINUTE_SKETCH_MINUTES = 10
+
+CREATE_SKETCHES_SQL = """
+CREATE TABLE IF NOT EXISTS hll_minutely (minute TEXT PRIMARY KEY, registers BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS hll_hourly (hour TEXT PRIMARY KEY, registers BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS hll_daily (day TEXT PRIMARY KEY, registers BLOB NOT NULL);
+"""
+
+# table -> (key column, timestamp prefix length)
+SKETCH_TABLES = {"hll_minutely": ("minute", 16), "hll_hourly": ("hour", 13), "hll_daily": ("day", 10)}
+
+# Top referrers and paths are Space-Saving summaries of TOP_K_CAPACITY
+# counters per kind, so storage and the top-N read stay fixed however many
+# distinct values arrive. Any item seen in more than 1/TOP_K_CAPACITY of the
+# views is guaranteed a counter; a count overstates the truth by at most its
+# error column.
+TOP_K_CAPACITY = 200
+
+CREATE_TOP_ITEMS_SQL = """
+CREATE TABLE IF NOT EXISTS top_items (
+    kind  TEXT    NOT NULL,
+    item  TEXT    NOT NULL,
+    count INTEGER NOT NULL,
+    error INTEGER NOT NULL,
+    PRIMARY KEY (kind, item)
+) WITHOUT ROWID;
+"""
+
+CREATE_DRAIN_STATE_SQL = """
+CREATE TABLE IF NOT EXISTS drain_state (id INTEGER PRIMARY KEY CHECK (id = 1), batch TEXT NOT NULL);
+"""
+
+PARTITION_TABLE_SQL = CREATE_TABLE_SQL.replace("EXISTS events", "EXISTS part.events")
+
+EXPORT_PAGE_SQL = f"""SELECT {", ".join(EXPORT_COLUMNS)} FROM events WHERE (timestamp, id) > (?, ?) AND timestamp < ? ORDER BY timestamp, id LIMIT ?"""
+
+INSERT_EVENT_SQL = """INSERT INTO events (event, path, referrer, user_agent, screen_width, country, timestamp, session_id) VALUES (:event, :path, :referrer, :user_agent, :screen_width, :country, :timestamp, :session_id)"""
+
+# ─── Schema migrations (PRAGMA user_version = number applied) ─────────────────
+
+MIGRATION_BATCH = 5000  # rows a backfill reads at a time
+
+def migrate_v1(db):
+    db.execute(CREATE_TABLE_SQL)
+    db.execute(CREATE_INDEX_SQL)
+
+# Sessions move out of the events table: backfill them from existing rows,
+# then drop the heartbeat rows that only existed to track activity.
+def migrate_v2(db):
+    db.execute(CREATE_SESSIONS_SQL)
+    db.execute(CREATE_SESSIONS_INDEX_SQL)
+    db.execute("""INSERT OR IGNORE INTO sessions (session_id, first_seen, last_seen) SELECT session_id, MIN(timestamp), MAX(timestamp) FROM events WHERE session_id IS NOT NULL AND session_id != '' GROUP BY session_id""")
+    db.execute("DELETE FROM events WHERE event = 'heartbeat'")
+
+# Rollups are backfilled from the raw events once; ingest() keeps them current.
+def migrate_v3(db):
+    for statement in CREATE_ROLLUPS_SQL.split(";"):
+        if statement.strip(): db.execute(statement)
+    write_rollups(db, *rollup(db.execute("SELECT timestamp, screen_width FROM events")))
+
+# Sketches are seeded from the raw events still in this file plus each
+# session's first and last sighting, MIGRATION_BATCH rows at a time.
+def migrate_v4(db):
+    for statement in CREATE_SKETCHES_SQL.split(";"):
+        if statement.strip(): db.execute(statement)
+    for query in ("SELECT timestamp, session_id FROM events WHERE session_id IS NOT NULL AND session_id != ''",
+                  "SELECT first_seen AS timestamp, session_id FROM sessions",
+                  "SELECT last_seen AS timestamp, session_id FROM sessions"):
+        rows = db.execute(query)
+        while True:
+            batch = rows.fetchmany(MIGRATION_BATCH)
+            if not batch: break
+            write_sketches(db, batch)
+
+# Referrers shrink to their origin, and the per-referrer rollup from v3 (if
+# this file has one) gives way to the bounded top_items summaries.
+def migrate_v5(db):
+    db.execute(CREATE_TOP_ITEMS_SQL)
+    db.create_function("referrer_origin", 1, referrer_origin, deterministic=True)
+    db.execute("UPDATE events SET referrer = referrer_origin(referrer) WHERE referrer IS NOT NULL AND referrer != ''")
+    referrers = dict(db.execute("SELECT referrer, COUNT(*) FROM events WHERE referrer != '' GROUP BY referrer").fetchall())
+    if db.execute("SELECT 1 FROM sqlite_master WHERE name = 'rollup_referrers'").fetchone():
+        referrers = {}  # the rollup already covers every event, including archived ones
+        for r in db.execute("SELECT referrer, views FROM rollup_referrers"):
+            origin = referrer_origin(r[0])
+            if origin: referrers[origin] = referrers.get(origin, 0) + r[1]
+        db.execute("DROP TABLE rollup_referrers")
+    paths = dict(db.execute("SELECT path, COUNT(*) FROM events WHERE path IS NOT NULL GROUP BY path").fetchall())
+    write_top_items(db, "referrer", referrers)
+    write_top_items(db, "path", paths)
+
+# The sketches replaced the sessions table, which was a write on every drain
+# that nothing read.
+def migrate_v6(db):
+    db.execute("DROP TABLE IF EXISTS sessions")
+
+# One row naming the last drain file committed, so a drain file that
+# outlives its commit is not ingested twice.
+def migrate_v7(db):
+    db.execute(CREATE_DRAIN_STATE_SQL)
+
+# An earlier v6 also dropped the hour sketches; they are kept again.
+def migrate_v8(db):
+    db.execute("CREATE TABLE IF NOT EXISTS hll_hourly (hour TEXT PRIMARY KEY, registers BLOB NOT NULL)")
+
+MIGRATIONS = [migrate_v1, migrate_v2, migrate_v3, migrate_v4, migrate_v5, migrate_v6, migrate_v7, migrate_v8]
+
+# Each step commits on its own, so an interrupted run resumes where it stopped.
+def migrate(db):
+    db.execute("PRAGMA auto_vacuum=INCREMENTAL")  # only takes effect on a new, empty file
+    db.execute("PRAGMA journal_mode=WAL")
+    while True:
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            version = db.execute("PRAGMA user_version").fetchone()[0]
+            if version >= len(MIGRATIONS):
+                db.rollback()
+                return version
+            MIGRATIONS[version](db)
+            db.execute(f"PRAGMA user_version={version + 1}")
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+def connect(timeout=DB_TIMEOUT):
+    import sqlite3
+    db = sqlite3.connect(DB_PATH, timeout=timeout)
+    db.row_factory = sqlite3.Row
+    return db
+
+# The backfills scan every event, so a request only migrates a new file (where
+# they are instant); an existing file waits for `analytics.py migrate` or the
+# next retention run, and meanwhile pageviews stay in the spool.
+def get_db(timeout=DB_TIMEOUT):
+    db = connect(timeout)
+    version = db.execute("PRAGMA user_version").fetchone()[0]
+    if version < len(MIGRATIONS):
+        if version or db.execute("SELECT 1 FROM sqlite_master WHERE name = 'events'").fetchone():
+            db.close()
+            raise RuntimeError(f"analytics.db is at schema v{version} of v{len(MIGRATIONS)}; run: python cgi-bin/analytics.py migrate")
+        migrate(db)
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+def run_migrations():
+    db = connect()
+    try: version = migrate(db)
+    finally: db.close()
+    return {"status": "ok", "schema_version": version}
+
+# ─── Rollups ──────────────────────────────────────────────────────────────────
+
+# Folds events (mappings with timestamp and screen_width) into per-hour and
+# per-day counts.
+def rollup(events):
+    hourly, daily = {}, {}
+    for e in events:
+        ts = e["timestamp"] or ""
+        column = DEVICE_COLUMNS.get(device_type(e["screen_width"]))
+        for counts, key in ((hourly, ts[:13]), (daily, ts[:10])):
+            row = counts.get(key)
+            if row is None: row = counts[key] = [0, 0, 0, 0]
+            row[0] += 1
+            if column: row[column] += 1
+    return hourly, daily
+
+def write_rollups(db, hourly, daily):
+    db.executemany(UPSERT_HOURLY_SQL, [(k, *row) for k, row in hourly.items()])
+    db.executemany(UPSERT_DAILY_SQL, [(k, *row) for k, row in daily.items()])
+
+# ─── Heavy hitters ────────────────────────────────────────────────────────────
+
+# Weighted Space-Saving: a new item takes over the smallest counter and
+# inherits its count as error. Returns the items whose counter changed.
+def space_saving(counters, weights, capacity):
+    touched = set()
+    for item, weight in sorted(weights.items(), key=lambda kv: -kv[1]):
+        counter = counters.get(item)
+        if counter is not None:
+            counter[0] += weight
+        elif len(counters) < capacity:
+            counters[item] = [weight, 0]
+        else:
+            victim = min(counters, key=lambda k: counters[k][0])
+            floor = counters.pop(victim)[0]
+            touched.add(victim)
+            counters[item] = [floor + weight, floor]
+        touched.add(item)
+    return touched
+
+def write_top_items(db, kind, weights):
+    if not weights: return
+    counters = {r[0]: [r[1], r[2]] for r in db.execute("SELECT item, count, error FROM top_items WHERE kind = ?", (kind,))}
+    touched = space_saving(counters, weights, TOP_K_CAPACITY)
+    db.executemany("DELETE FROM top_items WHERE kind = ? AND item = ?", [(kind, i) for i in touched if i not in counters])
+    db.executemany("INSERT OR REPLACE INTO top_items (kind, item, count, error) VALUES (?, ?, ?, ?)", [(kind, i, *counters[i]) for i in touched if i in counters])
+
+def top_items(db, kind, n=10):
+    return db.execute("SELECT item, count FROM top_items WHERE kind = ? ORDER BY count DESC LIMIT ?", (kind, n)).fetchall()
+
+# ─── HyperLogLog ──────────────────────────────────────────────────────────────
+
+# (register index, rank): the top HLL_P hash bits pick the register, the rank
+# is the position of the first set bit in the rest.
+def hll_point(item):
+    import hashlib
+    h = int.from_bytes(hashlib.blake2b(item.encode("utf-8"), digest_size=8).digest(), "big")
+    rest = h & ((1 << (64 - HLL_P)) - 1)
+    return h >> (64 - HLL_P), (64 - HLL_P) - rest.bit_length() + 1
+
+def hll_merge(sketches):
+    merged = None
+    for registers in sketches:
+        merged = registers if merged is None else bytes(map(max, merged, registers))
+    return merged
+
+def hll_count(registers):
+    if registers is None: return 0
+    estimate = HLL_ALPHA * HLL_M * HLL_M / sum(map(HLL_POW.__getitem__, registers))
+    zeros = registers.count(0)
+    if estimate <= 2.5 * HLL_M and zeros:
+        estimate = HLL_M * math.log(HLL_M / zeros)  # linear counting for small sets
+    return round(estimate)
+
+# Adds (timestamp, session_id) records to their minute and day sketches,
+# one read-modify-write per touched bucket.
+def write_sketches(db, records):
+    now = datetime.now(IST)
+    minute_floor = (now - timedelta(minutes=MINUTE_SKETCH_MINUTES)).strftime("%Y-%m-%dT%H:%M")
+    points, buckets = {}, {}
+    for r in records:
+        sid, ts = r["session_id"], r["timestamp"]
+        if not sid or not ts: continue
+        point = points.get(sid)
+        if point is None: point = points[sid] = hll_point(sid)
+        for table, (_column, width) in SKETCH_TABLES.items():
+            key = ts[:width]
+            if table == "hll_minutely" and key < minute_floor: continue
+            buckets.setdefault((table, key), set()).add(point)
+    for (table, key), bucket_points in buckets.items():
+        column = SKETCH_TABLES[table][0]
+        row = db.execute(f"SELECT registers FROM {table} WHERE {column} = ?", (key,)).fetchone()
+        registers = bytearray(row[0] if row else HLL_M)
+        for index, rank in bucket_points:
+            if registers[index] < rank: registers[index] = rank
+        db.execute(f"INSERT OR REPLACE INTO {table} ({column}, registers) VALUES (?, ?)", (key, bytes(registers)))
+    db.execute("DELETE FROM hll_minutely WHERE minute < ?", (minute_floor,))
+
+# Merged sketch of every bucket from start onwards
+def sketch_since(db, table, start):
+    column = SKETCH_TABLES[table][0]
+    return hll_merge(r[0] for r in db.execute(f"SELECT registers FROM {table} WHERE {column} >= ?", (start,)))
+
+# ─── Spool ────────────────────────────────────────────────────────────────────
+
+# `batch` names a drain file; one already committed is skipped. Returns
+# whether the records were written.
+def ingest(db, records, batch=None):
+    events = [r for r in records if r.get("event") != "heartbeat"]
+    with db:
+        if batch is not None:
+            db.execute("BEGIN IMMEDIATE")
+            if db.execute("SELECT 1 FROM drain_state WHERE batch = ?", (batch,)).fetchone(): return False
+            db.execute("INSERT OR REPLACE INTO drain_state (id, batch) VALUES (1, ?)", (batch,))
+        db.executemany(INSERT_EVENT_SQL, events)
+        write_rollups(db, *rollup(events))
+        referrers, paths = {}, {}
+        for e in events:
+            if e["referrer"]: referrers[e["referrer"]] = referrers.get(e["referrer"], 0) + 1
+            paths[e["path"]] = paths.get(e["path"], 0) + 1
+        write_top_items(db, "referrer", referrers)
+        write_top_items(db, "path", paths)
+        write_sketches(db, records)
+    return True
+
+def append_spool(lines):
+    data = b"".join(lines)
+    while True:
+        fd = os.open(SPOOL_PATH, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH)  # shared: appends run concurrently, drains wait
+            # A drain may have renamed the file between open and lock
+            try: current = os.stat(SPOOL_PATH).st_ino == os.fstat(fd).st_ino
+            except FileNotFoundError: current = False
+            if current:
+                os.write(fd, data)
+                return os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+
+# Returns (batch, lines) for the drain file, renaming the spool to it first
+# unless a failed drain left one behind; (None, []) if there is nothing to do.
+# The batch name identifies this file's contents for ingest().
+def take_spool():
+    if not os.path.exists(DRAIN_PATH):
+        try: fd = os.open(SPOOL_PATH, os.O_RDONLY)
+        except FileNotFoundError: return None, []
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)  # waits for in-flight appends to finish
+            os.rename(SPOOL_PATH, DRAIN_PATH)
+        finally:
+            os.close(fd)
+    with open(DRAIN_PATH, "rb") as f:
+        st = os.fstat(f.fileno())
+        return f"{st.st_ino}:{st.st_size}:{st.st_mtime_ns}", f.read().splitlines(keepends=True)
+
+# Moves spooled events into SQLite, one transaction per drain file. A drain
+# file left by a failed drain goes first, then the spool behind it. Returns
+# the count, or None if another process is already draining and blocking is
+# False.
+def drain_spool(blocking=False):
+    if fcntl is None: return 0
+    lock = os.open(DRAIN_LOCK_PATH, os.O_WRONLY | os.O_CREAT, 0o644)
+    try:
+        try: fcntl.flock(lock, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError: return None
+        os.utime(lock)  # mtime marks the last drain
+        count = 0
+        while True:
+            leftover = os.path.exists(DRAIN_PATH)
+            batch, lines = take_spool()
+            if batch is None: return count
+            count += drain_file(batch, lines, blocking)
+            if not leftover: return count
+    finally:
+        os.close(lock)
+
+# Ingests the drain file taken by take_spool() and removes it. Returns the
+# number of events written.
+def drain_file(batch, lines, blocking):
+    records = []
+    for line in lines:
+        try: records.append(json.loads(line))
+        except ValueError: pass  # a torn line from a crashed writer
+    if records:
+        import sqlite3
+        # If the database is locked or unavailable the drain file stays for the next drain
+        db = get_db(DB_TIMEOUT if blocking else DRAIN_TIMEOUT)
+        try:
+            if not ingest(db, records, batch): records = []
+        except sqlite3.OperationalError:
+            raise
+        except Exception as e:
+            # The batch itself cannot be written (e.g. a value SQLite cannot bind)
+            failed = FAILED_DRAIN_PATH.format(time.time_ns())
+            os.replace(DRAIN_PATH, failed)
+            print(f"analytics: drain failed ({e}); events kept in {failed}", file=sys.stderr)
+            return 0
+        finally: db.close()
+    os.remove(DRAIN_PATH)
+    return len(records)
+
+def record_event(record):
+    record_events([record])
+
+def record_events(records):
+    if fcntl is None:
+        db = get_db()
+        try: ingest(db, records)
+        finally: db.close()
+        return
+    size = append_spool([(json.dumps(r, ensure_ascii=False) + "\n").encode("utf-8") for r in records])
+    try: last_drain = os.stat(DRAIN_LOCK_PATH).st_mtime
+    except OSError: last_drain = 0
+    if size >= SPOOL_FLUSH_BYTES or time.time() - last_drain >= SPOOL_FLUSH_INTERVAL:
+        try: drain_spool()
+        except Exception: pass  # the events stay spooled for the next drain
+
+# ─── Retention ────────────────────────────────────────────────────────────────
+
+def partition_path(day):
+    return os.path.join(ARCHIVE_DIR, f"events-{day}.db")
+
+def list_partitions():
+    try: names = os.listdir(ARCHIVE_DIR)
+    except FileNotFoundError: return []
+    return sorted(n[7:-3] for n in names if n.startswith("events-") and n.endswith(".db"))
+
+# Moves one day of raw events into its partition file, RETENTION_BATCH rows
+# per transaction so a drain never waits long for the write lock. The copy is
+# INSERT OR IGNORE on the original id, so a move interrupted between the two
+# files is finished by the next run without duplicates.
+def move_day(db, day):
+    next_day = (datetime.strptime(day, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+    batch = "SELECT id FROM main.events WHERE timestamp >= ? AND timestamp < ? LIMIT ?"
+    args = (day, next_day, RETENTION_BATCH)
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    db.execute("ATTACH DATABASE ? AS part", (partition_path(day),))
+    try:
+        db.execute(PARTITION_TABLE_SQL)
+        moved = 0
+        while True:
+            with db:
+                db.execute("BEGIN IMMEDIATE")  # take the write lock before reading the batch
+                db.execute(f"INSERT OR IGNORE INTO part.events SELECT * FROM main.events WHERE id IN ({batch})", args)
+                n = db.execute(f"DELETE FROM main.events WHERE id IN ({batch})", args).rowcount
+            moved += n
+            if n < RETENTION_BATCH: return moved
+    finally:
+        db.execute("DETACH DATABASE part")
+
+def run_retention(now=None):
+    now = now or datetime.now(IST)
+    lock = os.open(RETENTION_LOCK_PATH, os.O_WRONLY | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            try: fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError: return {"status": "busy"}
+        db = connect()
+        try:
+            migrate(db)  # retention runs off the request path, so it may backfill
+            db.execute("PRAGMA synchronous=NORMAL")
+            if db.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                # One-time conversion of a file created before incremental
+                # vacuum; ingestion keeps spooling while this holds the lock.
+                db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                db.execute("VACUUM")
+            hot_start = (now - timedelta(days=HOT_DAYS - 1)).strftime("%Y-%m-%d")
+            moved = 0
+            while True:
+                row = db.execute("SELECT MIN(timestamp) FROM events WHERE timestamp < ?", (hot_start,)).fetchone()
+                if not row[0]: break
+                n = move_day(db, row[0][:10])
+                moved += n
+                if not n: break
+            raw_start = (now - timedelta(days=RAW_RETENTION_DAYS)).strftime("%Y-%m-%d")
+            dropped = [day for day in list_partitions() if day < raw_start]
+            for day in dropped:
+                for suffix in ("", "-journal"):
+                    try: os.remove(partition_path(day) + suffix)
+                    except FileNotFoundError: pass
+            with db:
+                hour_floor = (now - timedelta(days=HOURLY_RETENTION_DAYS)).strftime("%Y-%m-%dT%H")
+                db.execute("DELETE FROM rollup_hourly WHERE hour < ?", (hour_floor,))
+                db.execute("DELETE FROM hll_hourly WHERE hour < ?", (hour_floor,))
+                db.execute("DELETE FROM hll_daily WHERE day < ?", (raw_start,))
+            vacuumed = 0
+            while True:
+                free = db.execute("PRAGMA freelist_count").fetchone()[0]
+                if not free: break
+                # executescript steps the pragma to completion; execute() frees one page
+                db.executescript(f"PRAGMA incremental_vacuum({VACUUM_PAGES})")
+                vacuumed += min(free, VACUUM_PAGES)
+        finally:
+            db.close()
+    finally:
+        os.close(lock)
+    return {"status": "ok", "moved": moved, "dropped_partitions": dropped, "vacuumed_pages": vacuumed}
+
+# ─── Export ───────────────────────────────────────────────────────────────────
+
+# One source's events after the (timestamp, id) key `after` and before `end`,
+# read a page at a time.
+def export_pages(db, after, end):
+    while True:
+        rows = db.execute(EXPORT_PAGE_SQL, (*after, end, EXPORT_PAGE_ROWS)).fetchall()
+        yield from rows
+        if len(rows) < EXPORT_PAGE_ROWS: return
+        after = (rows[-1][1], rows[-1][0])
+
+def open_partition(day):
+    import sqlite3
+    return sqlite3.connect(f"file:{partition_path(day)}?mode=ro", uri=True, timeout=DB_TIMEOUT)
+
+# Partitions hold disjoint days, so they are read one after another; the
+# main file is merged in. A day whose move was interrupted is in both files
+# under the same ids, so a repeated key is skipped.
+def export_rows(after, end, limit=None):
+    import heapq
+    def partitions():
+        for day in list_partitions():
+            if day < after[0][:10] or day > end[:10]: continue
+            if not os.path.exists(partition_path(day)): continue  # dropped by retention meanwhile
+            db = open_partition(day)
+            try: yield from export_pages(db, after, end)
+            finally: db.close()
+    def main_file():
+        db = get_db()
+        db.row_factory = None
+        try: yield from export_pages(db, after, end)
+        finally: db.close()
+    last, count = None, 0
+    for row in heapq.merge(partitions(), main_file(), key=lambda r: (r[1], r[0])):
+        key = (row[1], row[0])
+        if key == last: continue
+        last = key
+        yield row
+        count += 1
+        if count == limit: return
+
+# Accepts a date or an ISO time; aware times are converted to IST, the zone
+# every stored timestamp is in, so the bound compares correctly as a string.
+def export_bound(value, name):
+    try: dt = datetime.fromisoformat(value)
+    except ValueError: raise ValueError(f"invalid {name}: {value}")
+    if dt.tzinfo is not None: dt = dt.astimezone(IST).replace(tzinfo=None)
+    return dt.isoformat()
+
+# The configured token, or "" (export off). A token file inside the project
+# directory is ignored: it would be downloadable.
+def export_token():
+    token = os.environ.get(EXPORT_TOKEN_ENV, "").strip()
+    path = os.environ.get(EXPORT_TOKEN_FILE_ENV, "")
+    if token or not path: return token
+    path = os.path.realpath(path)
+    if path.startswith(os.path.realpath(PROJECT_DIR) + os.sep): return ""
+    try:
+        with open(path, encoding="utf-8") as f: return f.read().strip()
+    except OSError:
+        return ""
+
+def export_authorized(token):
+    import hmac
+    expected = export_token()
+    return bool(expected) and hmac.compare_digest(token.encode("utf-8"), expected.encode("utf-8"))
+
+# Validates an export request and returns (content_type, filename, chunks),
+# where chunks yields encoded output. Rows are ordered by (timestamp, id);
+# with limit=N, a client continues from after=<last timestamp>,<last id>.
+def handle_export(params):
+    from urllib.parse import unquote
+    params = {k: unquote(v) for k, v in params.items()}
+    if not export_authorized(params.get("token", "")): raise PermissionError("export_forbidden")
+    fmt = params.get("format", "ndjson")
+    if fmt not in EXPORT_FORMATS: raise ValueError(f"invalid format: {fmt}")
+    today = datetime.now(IST).strftime("%Y-%m-%d")
+    start = export_bound(params.get("from") or today, "from")
+    end = export_bound(params["to"], "to") if params.get("to") else "9999"
+    after = (start, -1)
+    if params.get("after"):
+        ts, _, last_id = params["after"].rpartition(",")
+        try: after = max(after, (ts, int(last_id)))
+        except ValueError: raise ValueError(f"invalid after: {params['after']}")
+    try: limit = int(params["limit"]) if params.get("limit") else None
+    except ValueError: raise ValueError(f"invalid limit: {params['limit']}")
+    if limit is not None and limit < 1: raise ValueError(f"invalid limit: {limit}")
+    try: drain_spool()  # include what is spooled, unless a drain is already running
+    except Exception: pass
+    filename = f"meridian-events-{start[:10]}.{fmt}"
+    return EXPORT_FORMATS[fmt], filename, export_chunks(export_rows(after, end, limit), fmt)
+
+def export_chunks(rows, fmt):
+    if fmt == "csv":
+        import csv, io
+        buf = io.StringIO()
+        out = csv.writer(buf)
+        out.writerow(EXPORT_COLUMNS)
+        for row in rows:
+            out.writerow(row)
+            if buf.tell() >= EXPORT_CHUNK_BYTES:
+                yield buf.getvalue().encode("utf-8")
+                buf.seek(0)
+                buf.truncate()
+        if buf.tell(): yield buf.getvalue().encode("utf-8")
+        return
+    chunk, size = [], 0
+    for row in rows:
+        line = json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + "\n"
+        chunk.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield "".join(chunk).encode("utf-8")
+            chunk, size = [], 0
+    if chunk: yield "".join(chunk).encode("utf-8")
+
+def now_ist_str():
+    return datetime.now(IST).isoformat()
+
+def parse_qs(query_string):
+    params = {}
+    if not query_string: return params
+    for part in query_string.split("&"):
+        if "=" in part:
+            k, v = part.split("=", 1)
+            params[k.strip()] = v.strip()
+        elif part.strip():
+            params[part.strip()] = ""
+    return params
+
+# Referrers are kept as scheme://host[:port]; anything else is dropped.
+def referrer_origin(referrer):
+    if not referrer: return ""
+    from urllib.parse import urlsplit
+    try:
+        parts = urlsplit(referrer.strip())
+        port = parts.port
+    except ValueError:
+        return ""
+    if parts.scheme not in ("http", "https") or not parts.hostname: return ""
+    host = f"[{parts.hostname}]" if ":" in parts.hostname else parts.hostname
+    origin = f"{parts.scheme}://{host}"
+    if port and port != (443 if parts.scheme == "https" else 80): origin += f":{port}"
+    return origin
+
+def new_session_id():
+    import uuid
+    return str(uuid.uuid4())
+
+# An int in [0, SCREEN_WIDTH_MAX], or None for anything that is not a number
+def screen_width_value(value):
+    try: w = int(value)
+    except (ValueError, TypeError, OverflowError): return None
+    return min(max(w, 0), SCREEN_WIDTH_MAX)
+
+def device_type(screen_width):
+    if screen_width is None: return "unknown"
+    try: w = int(screen_width)
+    except (ValueError, TypeError): return "unknown"
+    if w >= 1024: return "desktop"
+    if w >= 768: return "tablet"
+    return "mobile"
+
+def handle_post(raw_body=None):
+    if raw_body is None:
+        content_length = int(os.environ.get("CONTENT_LENGTH", 0) or 0)
+        raw_body = sys.stdin.read(content_length) if content_length > 0 else sys.stdin.read()
+    try: body = json.loads(raw_body) if raw_body.strip() else {}
+    except json.JSONDecodeError: body = {}
+    event        = str(body.get("event", "pageview"))[:64]
+    path         = str(body.get("path", "/"))[:1024]
+    referrer     = referrer_origin(str(body.get("referrer", "") or "")[:2048])
+    user_agent   = str(body.get("user_agent", "") or "")[:512]
+    screen_width = screen_width_value(body.get("screen_width"))
+    country      = str(body.get("country", "") or "")[:8]
+    session_id   = str(body.get("session_id", "") or new_session_id())[:64]
+    timestamp    = now_ist_str()
+    record_event({"event": event, "path": path, "referrer": referrer, "user_agent": user_agent, "screen_width": screen_width, "country": country, "timestamp": timestamp, "session_id": session_id})
+    return {"status": "recorded"}
+
+def handle_heartbeat(session_id):
+    session_id = (str(session_id) or new_session_id())[:64]
+    timestamp  = now_ist_str()
+    record_event({"event": "heartbeat", "timestamp": timestamp, "session_id": session_id})
+    return {"status": "ok"}
+
+# One heartbeat per session, all spooled in one append (server.py: open push connections)
+def handle_heartbeats(session_ids):
+    timestamp = now_ist_str()
+    records = [{"event": "heartbeat", "timestamp": timestamp, "session_id": str(sid)[:64]} for sid in session_ids if sid]
+    if records: record_events(records)
+    return {"status": "ok", "count": len(records)}
+
+def handle_summary():
+    try: drain_spool(blocking=True)  # include everything recorded so far
+    except Exception: pass  # busy (e.g. retention's VACUUM): serve what is committed
+    db = get_db()
+    now_ist_dt = datetime.now(IST)
+    row = db.execute("SELECT SUM(views) AS views, SUM(desktop) AS desktop, SUM(tablet) AS tablet, SUM(mobile) AS mobile FROM rollup_daily").fetchone()
+    total_views = row["views"] or 0
+    device_counts = {"desktop": row["desktop"] or 0, "mobile": row["mobile"] or 0, "tablet": row["tablet"] or 0}
+    row = db.execute("SELECT views FROM rollup_daily WHERE day = ?", (now_ist_dt.strftime("%Y-%m-%d"),)).fetchone()
+    today_views = row["views"] if row else 0
+    # Unique counts are HyperLogLog estimates (see HLL_P for the error bound)
+    five_min_ago = (now_ist_dt - timedelta(minutes=5)).strftime("%Y-%m-%dT%H:%M")
+    active_last_5min = hll_count(sketch_since(db, "hll_minutely", five_min_ago))
+    unique_sessions_today = hll_count(sketch_since(db, "hll_daily", now_ist_dt.strftime("%Y-%m-%d")))
+    week_start = (now_ist_dt - timedelta(days=6)).strftime("%Y-%m-%d")  # today plus the six days before
+    unique_sessions_7d = hll_count(sketch_since(db, "hll_daily", week_start))
+    # The last 24 hour buckets, up to and including the current one
+    first_hour = (now_ist_dt - timedelta(hours=23)).strftime("%Y-%m-%dT%H")
+    unique_sessions_24h = hll_count(sketch_since(db, "hll_hourly", first_hour))
+    top_referrers = [{"referrer": r["item"], "count": r["count"]} for r in top_items(db, "referrer")]
+    top_paths = [{"path": r["item"], "count": r["count"]} for r in top_items(db, "path")]
+    rows = db.execute("""SELECT substr(hour, 12, 2) AS hour, views FROM rollup_hourly WHERE hour >= ? ORDER BY 1""", (first_hour,)).fetchall()
+    views_by_hour = [{"hour": r["hour"], "count": r["views"]} for r in rows]
+    db.close()
+    return {"total_views": total_views, "today_views": today_views, "active_last_5min": active_last_5min, "unique_sessions_today": unique_sessions_today, "unique_sessions_7d": unique_sessions_7d, "unique_sessions_24h": unique_sessions_24h, "top_referrers": top_referrers, "top_paths": top_paths, "views_by_hour": views_by_hour, "device_breakdown": device_counts}
+
+# The CGI server passes the body through as it is written (chunked to the
+# client where the server does that), so only one chunk is held at a time.
+# The first chunk is produced before the headers, so a bad request or an
+# unreadable database still gets a JSON error.
+def write_export(params):
+    try:
+        content_type, filename, chunks = handle_export(params)
+        first = next(chunks, b"")
+    except Exception as e:
+        status = {PermissionError: "403 Forbidden", ValueError: "400 Bad Request"}.get(type(e), "500 Internal Server Error")
+        sys.stdout.write(f"Status: {status}\nContent-Type: application/json\nAccess-Control-Allow-Origin: *\n\n")
+        print(json.dumps({"status": "error", "error": str(e)}, ensure_ascii=False))
+        return
+    sys.stdout.write(f"Content-Type: {content_type}\nContent-Disposition: attachment; filename=\"{filename}\"\nAccess-Control-Allow-Origin: *\nCache-Control: no-store\n\n")
+    sys.stdout.flush()
+    out = sys.stdout.buffer
+    out.write(first)
+    for chunk in chunks:
+        out.write(chunk)
+        out.flush()
+
+def main():
+    sys.stdout.reconfigure(encoding="utf-8")
+    if "REQUEST_METHOD" not in os.environ and sys.argv[1:] == ["retention"]:
+        print(json.dumps(run_retention()))
+        return
+    if "REQUEST_METHOD" not in os.environ and sys.argv[1:] == ["migrate"]:
+        print(json.dumps(run_migrations()))
+        return
+    params = parse_qs(os.environ.get("QUERY_STRING", ""))
+    if os.environ.get("REQUEST_METHOD", "GET").upper() == "GET" and params.get("action") == "export":
+        return write_export(params)
+    print("Content-Type: application/json")
+    print("Access-Control-Allow-Origin: *")
+    print("Cache-Control: no-cache, no-store")
+    print()
+    try:
+        method = os.environ.get("REQUEST_METHOD", "GET").upper()
+        if method == "POST":
+            result = handle_post()
+        elif method == "GET":
+            action = params.get("action", "summary")
+            if action == "heartbeat":
+                session_id = params.get("session_id", "")
+                result = handle_heartbeat(session_id)
+            else:
+                result = handle_summary()
+        elif method == "OPTIONS":
+            print("Access-Control-Allow-Methods: GET, POST, OPTIONS")
+            print("Access-Control-Allow-Headers: Content-Type")
+            result = {"status": "ok"}
+        else:
+            result = {"status": "error", "error": f"method_not_allowed: {method}"}
+        print(json.dumps(result, ensure_ascii=False))
+    except Exception as e:
+        print(json.dumps({"status": "error", "error": str(e)}, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,1953 @@
+#!/usr/bin/env python3
+"""
+MERIDIAN INTEL — Live Intelligence Feed engine
+Imported by cgi-bin/feed.py and by server.py.
+
+Aggregates real-time intelligence from RSS feeds, filters for geopolitical
+relevance, and returns JSON. Uses file-based caching (60-second TTL).
+
+feed.py answers fresh cache hits from feed_cache.body on its own and imports
+this module for everything else, so the fetch, parse and archive machinery
+(and its imports) is only loaded when there is work for it.
+"""
+
+import json
+import os
+import sys
+import gzip
+import hashlib
+import heapq
+import re
+import socket
+import sqlite3
+import struct
+import time
+import tempfile
+import threading
+import email.utils
+import html as html_module
+from datetime import datetime, timezone, timedelta
+from operator import attrgetter
+from urllib.parse import parse_qsl
+from urllib.request import Request, build_opener, HTTPHandler, HTTPSHandler
+from http.client import HTTPConnection, HTTPSConnection
+from urllib.error import URLError, HTTPError
+import xml.etree.ElementTree as ET
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX platforms: no cross-process refresh lock
+    fcntl = None
+
+# ─── IST timezone (UTC+5:30) ──────────────────────────────────────────────────
+IST = timezone(timedelta(hours=5, minutes=30))
+
+# ─── Cache settings ───────────────────────────────────────────────────────────
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.join(SCRIPT_DIR, "..")
+CACHE_FILE = os.path.join(PROJECT_DIR, "feed_cache.json")
+LOCK_FILE = os.path.join(PROJECT_DIR, "feed_cache.lock")
+BODY_CACHE_FILE = os.path.join(PROJECT_DIR, "feed_cache.body")
+SOURCE_STATE_FILE = os.path.join(PROJECT_DIR, "feed_sources.json")
+ITEM_CACHE_FILE = os.path.join(PROJECT_DIR, "feed_items.json")
+ARCHIVE_DB = os.path.join(PROJECT_DIR, "feed_archive.db")
+METRICS_LOG_FILE = os.path.join(PROJECT_DIR, "feed_metrics.log")
+METRICS_STATE_FILE = os.path.join(PROJECT_DIR, "feed_metrics.json")
+CACHE_TTL = 60  # seconds
+# server.py and the CGI fallback may run as different users and share these
+# files, so they get the permissions a plain open() would give them.
+FILE_MODE = 0o666 & ~os.umask(os.umask(0))
+FEED_WINDOW = 50        # entries per response
+TOMBSTONE_REVS = 100    # cursor revisions for which ?since= deltas stay exact
+GZIP_LEVEL = 6
+
+# ─── Fetch settings ───────────────────────────────────────────────────────────
+FETCH_TIMEOUT = 5    # seconds, per URL attempt
+FETCH_DEADLINE = 8   # seconds, overall budget for one refresh of all sources
+MAX_FEED_BYTES = 4 * 1024 * 1024  # larger feed bodies are rejected
+FEED_CHUNK = 64 * 1024            # bytes read from the socket per parser feed
+EARLY_STOP_RUN = 5   # consecutive past-cutoff items that end a date-ordered feed
+
+# Circuit breaker, per URL: after BREAKER_THRESHOLD consecutive failures the
+# URL is skipped for BREAKER_BACKOFF seconds, doubling with every failed
+# probe after that, up to BREAKER_MAX_BACKOFF.
+BREAKER_THRESHOLD = 3
+BREAKER_BACKOFF = 60
+BREAKER_MAX_BACKOFF = 3600
+
+# Adaptive polling, per source: the interval halves when a fetch brings new
+# entries and grows by POLL_BACKOFF when it does not. Between polls the
+# source's last entries are reused and it reports "idle".
+POLL_MIN = CACHE_TTL
+POLL_MAX = 15 * 60
+POLL_BACKOFF = 1.5
+
+# ─── RSS Sources ──────────────────────────────────────────────────────────────
+RSS_SOURCES = [
+    {
+        "key": "reuters",
+        "tag": "REUTERS",
+        "urls": [
+            "https://www.reuters.com/rssFeed/worldNews/",
+            "https://feeds.reuters.com/Reuters/worldNews",
+        ],
+    },
+    {
+        "key": "aljazeera",
+        "tag": "ALJAZEERA",
+        "urls": ["https://www.aljazeera.com/xml/rss/all.xml"],
+    },
+    {
+        "key": "bbc",
+        "tag": "BBC",
+        "urls": ["http://feeds.bbci.co.uk/news/world/rss.xml"],
+    },
+    {
+        "key": "ap",
+        "tag": "AP",
+        "urls": ["https://rsshub.app/apnews/topics/apf-topnews"],
+    },
+    {
+        "key": "toi",
+        "tag": "TOI",
+        "urls": ["https://www.timesofisrael.com/feed/"],
+    },
+]
+
+# ─── Relevance keywords (case-insensitive, whole words) ───────────────────────
+# Defaults; keywords.json in the project root may override any of the three
+# lists: {"keywords": [...], "flash": [...], "urgent": [...]}.
+KEYWORDS_FILE = os.path.join(PROJECT_DIR, "keywords.json")
+
+KEYWORDS = [
+    "iran", "iranian", "israel", "israeli", "idf", "irgc", "tehran", "isfahan",
+    "netanyahu", "khamenei", "trump", "pentagon", "centcom",
+    "middle east", "hezbollah", "houthi", "hormuz", "nuclear",
+    "ballistic", "missile", "strike", "airstrike", "attack", "war", "warship",
+    "warplane", "warhead", "conflict", "military", "airspace", "ceasefire",
+    "retaliation", "sanctions",
+]
+
+# ─── Priority word lists ──────────────────────────────────────────────────────
+FLASH_WORDS  = ["breaking", "flash", "missile", "strike", "airstrike", "attack",
+                "attacked", "killed", "launch", "launched"]
+URGENT_WORDS = ["urgent", "warning", "retaliation", "emergency"]
+
+# ─── Hardcoded baseline entries (always included as fallback) ─────────────────
+BASELINE_ENTRIES = [
+    {
+        "id": "baseline_001",
+        "time": "2026-02-28T17:30:00+05:30",
+        "time_display": "28 FEB 2026 / 17:30 IST",
+        "priority": "flash",
+        "source_tag": "IRGC",
+        "source_class": "official",
+        "title": "IRGC confirms second wave of ballistic missiles launched toward Israel",
+        "content": "Second wave of ballistic missiles launched toward Israel. IRGC confirms additional strikes incoming.",
+    },
+    {
+        "id": "baseline_002",
+        "time": "2026-02-28T17:18:00+05:30",
+        "time_display": "28 FEB 2026 / 17:18 IST",
+        "priority": "flash",
+        "source_tag": "IDF",
+        "source_class": "official",
+        "title": "IDF intercepting second Iranian missile barrage — Arrow and Iron Dome active across Israel",
+        "content": "Israeli Air Force intercepting second barrage of Iranian missiles. Iron Dome and Arrow systems active across northern and central Israel.",
+    },
+    {
+        "id": "baseline_003",
+        "time": "2026-02-28T17:05:00+05:30",
+        "time_display": "28 FEB 2026 / 17:05 IST",
+        "priority": "urgent",
+        "source_tag": "OSINT",
+        "source_class": "media",
+        "title": "Shamkhani reportedly killed in strikes — Khamenei evacuated to secure location",
+        "content": "Reports: Ali Shamkhani, Secretary of Supreme National Security Council, killed in strikes. Khamenei status unknown — relocated to secure location. Information unverified.",
+    },
+    {
+        "id": "baseline_004",
+        "time": "2026-02-28T16:58:00+05:30",
+        "time_display": "28 FEB 2026 / 16:58 IST",
+        "priority": "urgent",
+        "source_tag": "OSINT",
+        "source_class": "media",
+        "title": "Trump: 'We are going to obliterate their missiles' — operation continues indefinitely",
+        "content": "Trump: \"We are going to obliterate their missiles and dismantle their missile industry completely.\" Operation to continue \"as long as necessary.\"",
+    },
+    {
+        "id": "baseline_005",
+        "time": "2026-02-28T16:45:00+05:30",
+        "time_display": "28 FEB 2026 / 16:45 IST",
+        "priority": "flash",
+        "source_tag": "IDF",
+        "source_class": "official",
+        "title": "IDF: broad strike on Iran defense systems complete — state of emergency declared",
+        "content": "IDF declares \"broad strike\" on Iran's defense systems completed. State of emergency declared across Israel. Home front command issues instructions to civilians.",
+    },
+    {
+        "id": "baseline_006",
+        "time": "2026-02-28T16:30:00+05:30",
+        "time_display": "28 FEB 2026 / 16:30 IST",
+        "priority": "urgent",
+        "source_tag": "REUTERS",
+        "source_class": "media",
+        "title": "Iran FM: Armed Forces will respond decisively — emergency parliament session convened",
+        "content": "Iran's foreign ministry: \"Armed Forces will respond decisively to aggressors.\" Tehran preparing \"crushing\" retaliation. Parliament session convened in emergency.",
+    },
+    {
+        "id": "baseline_007",
+        "time": "2026-02-28T16:12:00+05:30",
+        "time_display": "28 FEB 2026 / 16:12 IST",
+        "priority": "flash",
+        "source_tag": "OSINT",
+        "source_class": "media",
+        "title": "Explosions confirmed: Tehran, Isfahan, Qom, Karaj, Kermanshah — strikes near Khamenei compound",
+        "content": "Explosions confirmed in Tehran, Isfahan, Qom, Karaj, Kermanshah. Strikes near Supreme Leader Khamenei's compound — 7 missiles confirmed hitting the area. Heavy smoke over Parchin.",
+    },
+    {
+        "id": "baseline_008",
+        "time": "2026-02-28T15:50:00+05:30",
+        "time_display": "28 FEB 2026 / 15:50 IST",
+        "priority": "urgent",
+        "source_tag": "OSINT",
+        "source_class": "media",
+        "title": "Trump confirms major combat operations — Operation Epic Fury / Operation Roaring Lion",
+        "content": "Trump confirms \"major combat operations\" in Iran. Operation codenamed \"Epic Fury.\" Netanyahu: \"Operation Roaring Lion / Shield of Judah.\" Joint statement from White House and PMO.",
+    },
+    {
+        "id": "baseline_009",
+        "time": "2026-02-28T15:32:00+05:30",
+        "time_display": "28 FEB 2026 / 15:32 IST",
+        "priority": "flash",
+        "source_tag": "IDF",
+        "source_class": "official",
+        "title": "Israel launches pre-emptive strike on Iran — IAF and naval forces participating",
+        "content": "Israel launches pre-emptive strike on Iran. IAF aircraft and naval forces participating. Defense Minister Katz declares immediate state of emergency across all districts.",
+    },
+    {
+        "id": "baseline_010",
+        "time": "2026-02-27T14:00:00+05:30",
+        "time_display": "27 FEB 2026 / 14:00 IST",
+        "priority": "routine",
+        "source_tag": "REUTERS",
+        "source_class": "media",
+        "title": "Geneva nuclear talks end without deal — Oman mediation effort officially collapses",
+        "content": "Nuclear talks in Geneva conclude without deal. Iran rejects demands to dismantle Fordow, Natanz, Isfahan facilities. Oman mediation effort officially collapsed.",
+    },
+]
+
+
+# ─── Helpers ──────────────────────────────────────────────────────────────────
+
+def now_ist():
+    """Return current datetime in IST."""
+    return datetime.now(IST)
+
+
+def format_display(dt):
+    """Format datetime as '28 FEB 2026 / 17:30 IST'."""
+    return dt.strftime("%d %b %Y / %H:%M IST").upper()
+
+
+def make_id(url_or_title):
+    """SHA-1 hash truncated to 16 chars for use as entry ID."""
+    return hashlib.sha1(url_or_title.encode("utf-8")).hexdigest()[:16]
+
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+def tokenize(text):
+    """Lowercase word tokens; punctuation and hyphens separate words."""
+    return _WORD_RE.findall(text.lower())
+
+
+class KeywordMatcher:
+    """
+    Whole-word keyword matcher that scans each text once.
+
+    Keywords are normalised with tokenize(), so "Middle-East" and
+    "middle east" are the same phrase. Matching looks up every n-gram of the
+    text (up to the longest phrase) in a dict, so the cost per item grows
+    with text length, not with the number of keywords. A plural "s"/"es" on
+    the last word is folded: "strike" matches "strikes" but not "striker",
+    and "war" no longer matches "award" or "Warsaw".
+    """
+
+    def __init__(self, keywords):
+        self.phrases = {}   # "word word" -> keyword as configured
+        self.starts = {}    # first word -> longest phrase length starting with it
+        for kw in keywords:
+            words = tokenize(kw)
+            if words:
+                self.phrases.setdefault(" ".join(words), kw)
+                self.starts[words[0]] = max(self.starts.get(words[0], 0), len(words))
+
+    def _lookup(self, key):
+        kw = self.phrases.get(key)
+        if kw is None and key.endswith("s"):
+            kw = self.phrases.get(key[:-1])
+            if kw is None and key.endswith("es"):
+                kw = self.phrases.get(key[:-2])
+        return kw
+
+    def find(self, text, first=False):
+        """
+        Return the keywords found in `text`, in order of first appearance.
+        With first=True, stop at (and return a list of) the first match.
+        """
+        words = tokenize(text)
+        starts = self.starts
+        found = {}
+        for i, w in enumerate(words):
+            span = starts.get(w)
+            if span is None:
+                # Only a single-word keyword can match a plural first word
+                if not w.endswith("s"):
+                    continue
+                span = 1
+            for k in range(1, min(span, len(words) - i) + 1):
+                kw = self._lookup(" ".join(words[i:i + k]) if k > 1 else w)
+                if kw is not None:
+                    if first:
+                        return [kw]
+                    found[kw] = True
+        return list(found)
+
+    def search(self, text):
+        """Return the first keyword found in `text`, or None."""
+        hits = self.find(text, first=True)
+        return hits[0] if hits else None
+
+
+def load_keyword_config(path=None):
+    """
+    Read keywords.json if present. Returns (keywords, flash, urgent), with
+    the module defaults for any list the file does not define.
+    """
+    config = {}
+    try:
+        with open(path or KEYWORDS_FILE, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        pass
+    return (
+        config.get("keywords", KEYWORDS),
+        config.get("flash", FLASH_WORDS),
+        config.get("urgent", URGENT_WORDS),
+    )
+
+
+_keywords, _flash, _urgent = load_keyword_config()
+RELEVANCE_MATCHER = KeywordMatcher(_keywords)
+FLASH_MATCHER = KeywordMatcher(_flash)
+URGENT_MATCHER = KeywordMatcher(_urgent)
+
+
+def classify_priority(title):
+    """Classify entry priority based on title keywords."""
+    if FLASH_MATCHER.search(title):
+        return "flash"
+    if URGENT_MATCHER.search(title):
+        return "urgent"
+    return "routine"
+
+
+def is_relevant(text):
+    """Return True if text contains any geopolitical keyword."""
+    return RELEVANCE_MATCHER.search(text) is not None
+
+
+def match_keywords(text):
+    """Return every geopolitical keyword in text (e.g. for relevance scoring)."""
+    return RELEVANCE_MATCHER.find(text)
+
+
+def strip_html(text):
+    """Remove HTML tags and decode entities from a string."""
+    cleaned = re.sub(r"<[^>]+>", "", text or "").strip()
+    return html_module.unescape(cleaned)
+
+
+def parse_date(date_str):
+    """
+    Parse RFC 2822 (RSS pubDate) or ISO 8601 (Atom) date strings.
+    Returns a timezone-aware datetime in IST, or None on failure.
+    """
+    if not date_str:
+        return None
+    date_str = date_str.strip()
+    # Try RFC 2822 first (typical RSS)
+    try:
+        parsed = email.utils.parsedate_to_datetime(date_str)
+        return parsed.astimezone(IST)
+    except Exception:
+        pass
+    # Try ISO 8601
+    try:
+        normalized = date_str.replace("Z", "+00:00")
+        normalized = re.sub(r"\.\d+", "", normalized)  # strip fractional seconds
+        return datetime.fromisoformat(normalized).astimezone(IST)
+    except Exception:
+        pass
+    return None
+
+
+class FeedTooLarge(Exception):
+    """Raised when a feed body exceeds MAX_FEED_BYTES."""
+
+
+ATOM_NS = "http://www.w3.org/2005/Atom"
+DC_NS = "http://purl.org/dc/elements/1.1/"
+
+
+def _local(tag):
+    """Strip the '{namespace}' prefix from an element tag."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _child_text(el, *names):
+    """Text of the first direct child whose local name is in `names`."""
+    for name in names:
+        for child in el:
+            if _local(child.tag) == name and child.text:
+                return child.text
+    return ""
+
+
+def _rss_item(el):
+    """Raw (title, link, description, date_str) for an RSS <item>."""
+    date_str = _child_text(el, "pubDate")
+    if not date_str:
+        date_el = el.find(f"{{{DC_NS}}}date")
+        date_str = (date_el.text or "") if date_el is not None else ""
+    return (
+        _child_text(el, "title"),
+        _child_text(el, "link").strip(),
+        _child_text(el, "description"),
+        date_str.strip(),
+    )
+
+
+def _atom_entry(el):
+    """Raw (title, link, description, date_str) for an Atom <entry>."""
+    link = ""
+    for child in el:
+        if _local(child.tag) == "link":
+            href = child.get("href", "") or (child.text or "")
+            if child.get("rel", "alternate") == "alternate":
+                link = href
+                break
+            link = link or href
+    return (
+        _child_text(el, "title"),
+        link.strip(),
+        _child_text(el, "summary", "content"),
+        _child_text(el, "updated", "published").strip(),
+    )
+
+
+def iter_feed_items(stream, max_bytes=None, raw=False):
+    """
+    Incrementally parse an RSS 2.0 or Atom document from a file-like
+    `stream`, yielding (title, link, description, date_str) per item.
+    Title and description have their HTML stripped unless `raw` is true.
+
+    The body is read FEED_CHUNK bytes at a time and fed to a pull parser;
+    each item is yielded as soon as its closing tag arrives and is then
+    detached from the tree, so memory stays bounded by one item plus one
+    chunk. A consumer that stops iterating also stops the download.
+    Raises FeedTooLarge past `max_bytes` (default MAX_FEED_BYTES).
+    """
+    if max_bytes is None:
+        max_bytes = MAX_FEED_BYTES
+    parser = ET.XMLPullParser(events=("start", "end"))
+    stack = []
+    total = 0
+
+    def drain():
+        for event, el in parser.read_events():
+            if event == "start":
+                stack.append(el)
+                continue
+            stack.pop()
+            name = _local(el.tag)
+            if name == "item":
+                item = _rss_item(el)
+            elif name == "entry" and el.tag in ("entry", f"{{{ATOM_NS}}}entry"):
+                item = _atom_entry(el)
+            else:
+                continue
+            if stack:
+                stack[-1].remove(el)
+            el.clear()
+            if not raw:
+                item = (strip_html(item[0]), item[1], strip_html(item[2]), item[3])
+            yield item
+
+    while True:
+        chunk = stream.read(FEED_CHUNK)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise FeedTooLarge(f"body exceeds {max_bytes} bytes")
+        parser.feed(chunk)
+        yield from drain()
+    parser.close()
+    yield from drain()
+
+
+# ─── Entry records ────────────────────────────────────────────────────────────
+# A refresh can hold tens of thousands of candidate items, of which only
+# FEED_WINDOW are sent. Candidates are FeedEntry records rather than dicts:
+# slotted, ordered by an integer epoch timestamp, with source tags interned,
+# and their ISO / display time strings are only formatted for entries that
+# are written out (the response window and archive rows).
+
+class FeedEntry:
+    """One feed item; `ts` is epoch seconds. to_dict() gives the wire form."""
+
+    __slots__ = ("id", "ts", "priority", "source_tag", "source_class",
+                 "title", "content", "source_tags", "cluster_size")
+
+    def __init__(self, id, ts, priority, source_tag, source_class, title, content,
+                 source_tags=None, cluster_size=None):
+        self.id = id
+        self.ts = ts
+        self.priority = priority
+        self.source_tag = sys.intern(source_tag)
+        self.source_class = sys.intern(source_class)
+        self.title = title
+        self.content = content
+        self.source_tags = source_tags
+        self.cluster_size = cluster_size
+
+    @classmethod
+    def from_dict(cls, d):
+        """Build a record from the dict form (baseline entries, older state files)."""
+        return cls(d["id"], parse_ts(d.get("time")), d.get("priority", "routine"),
+                   d.get("source_tag", "NEWS"), d.get("source_class", "media"),
+                   d.get("title", ""), d.get("content", ""),
+                   d.get("source_tags"), d.get("cluster_size"))
+
+    @classmethod
+    def from_state(cls, row, source_tag):
+        """Inverse of to_state() for an entry of the source tagged `source_tag`."""
+        if isinstance(row, dict):
+            return cls.from_dict(row)
+        entry_id, ts, priority, title, content = row
+        return cls(entry_id, ts, priority, source_tag, "media", title, content)
+
+    def to_state(self):
+        """Compact row kept in feed_sources.json (tag and class come from the source)."""
+        return [self.id, self.ts, self.priority, self.title, self.content]
+
+    def copy(self):
+        return FeedEntry(self.id, self.ts, self.priority, self.source_tag, self.source_class,
+                         self.title, self.content, self.source_tags, self.cluster_size)
+
+    def iso_time(self):
+        return datetime.fromtimestamp(self.ts, IST).isoformat()
+
+    def to_dict(self):
+        """The response / cache form, with its time strings formatted now."""
+        dt = datetime.fromtimestamp(self.ts, IST)
+        d = {
+            "id": self.id,
+            "time": dt.isoformat(),
+            "time_display": format_display(dt),
+            "priority": self.priority,
+            "source_tag": self.source_tag,
+            "source_class": self.source_class,
+            "title": self.title,
+            "content": self.content,
+        }
+        if self.source_tags is not None:
+            d["source_tags"] = self.source_tags
+            d["cluster_size"] = self.cluster_size
+        return d
+
+
+def parse_ts(iso, default=None):
+    """Epoch seconds of an ISO 8601 time string; `default` (or now) if it does not parse."""
+    try:
+        return int(datetime.fromisoformat(iso).timestamp())
+    except (TypeError, ValueError):
+        return int(time.time()) if default is None else default
+
+
+# ─── Item cache ───────────────────────────────────────────────────────────────
+# Most items in a feed are unchanged from one refresh to the next. The result
+# of process_item() is kept in feed_items.json under a hash of the raw item,
+# so only new or edited items go through HTML stripping, date parsing,
+# keyword matching and hashing. On save, results unused for ITEM_CACHE_TTL
+# are dropped, then the least recently used beyond ITEM_CACHE_MAX. Results
+# computed with other keyword lists (or an older ITEM_CACHE_VERSION) are
+# never reused.
+
+ITEM_CACHE_MAX = 20000        # results kept; well above the items of one refresh
+ITEM_CACHE_TTL = 24 * 3600    # seconds a result is kept without being used
+ITEM_CACHE_VERSION = 1        # bump when process_item() changes its output
+
+ITEM_CACHE_FINGERPRINT = hashlib.sha1(
+    json.dumps([ITEM_CACHE_VERSION, _keywords, _flash, _urgent]).encode("utf-8")
+).hexdigest()[:16]
+
+
+def item_key(item):
+    """Cache key of a raw (title, link, description, date_str) item."""
+    return hashlib.sha1("\x1f".join(item).encode("utf-8")).hexdigest()[:20]
+
+
+def process_item(item, cutoff):
+    """
+    The per-item work of fetch_source() for a raw item. Returns [pub_ts,
+    id, priority, title, content], where pub_ts (epoch seconds) is None for
+    an undated item and id is None for an item that is not an entry:
+    dated before `cutoff`, untitled, or not relevant. An item dated before
+    the cutoff stays before it, so the result can be reused on later runs.
+    """
+    title, link, description, date_str = item
+    pub_dt = parse_date(date_str)
+    pub_ts = int(pub_dt.timestamp()) if pub_dt is not None else None
+    if pub_ts is not None and pub_ts < cutoff:
+        return [pub_ts, None, None, None, None]
+    title = strip_html(title)
+    if not title:
+        return [pub_ts, None, None, None, None]
+    description = strip_html(description)
+    if not is_relevant(title + " " + description):
+        return [pub_ts, None, None, None, None]
+    content = (description[:280] if description else title[:280])
+    return [pub_ts, make_id(link or title), classify_priority(title), title, content]
+
+
+def load_item_cache():
+    """
+    Load feed_items.json as {item_key: [last_used, *process_item() result]}.
+    Returns {} if missing, unreadable, or built with other keyword lists.
+    """
+    try:
+        with open(ITEM_CACHE_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("fingerprint") == ITEM_CACHE_FINGERPRINT:
+            return data["items"]
+    except Exception:
+        pass
+    return {}
+
+
+def save_item_cache(cache):
+    """Evict expired and least recently used results, then atomically write."""
+    cutoff = time.time() - ITEM_CACHE_TTL
+    items = [(k, v) for k, v in dict(cache).items() if v[0] >= cutoff]  # dict(): late workers may still add
+    if len(items) > ITEM_CACHE_MAX:
+        items = heapq.nlargest(ITEM_CACHE_MAX, items, key=lambda kv: kv[1][0])
+    try:
+        data = {"fingerprint": ITEM_CACHE_FINGERPRINT, "items": dict(items)}
+        write_atomic(ITEM_CACHE_FILE, json.dumps(data, separators=(",", ":")).encode("utf-8"))
+    except Exception:
+        pass  # Losing the cache only costs reprocessing next time
+
+
+# ─── Fetch instrumentation ────────────────────────────────────────────────────
+# fetch_source() points a thread-local at its stats dict; the connection
+# classes below add DNS and connect (TCP + TLS) time to it, which urllib
+# does not expose otherwise.
+
+_fetch_stats = threading.local()
+
+
+def _add_ms(stats, key, seconds):
+    stats[key] = round(stats.get(key, 0) + seconds * 1000, 1)
+
+
+class _TimedConnection:
+    """Mixin for http.client connections that reports dns_ms / connect_ms."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = self._resolve_and_connect
+        self._dns_seconds = 0.0
+
+    def _resolve_and_connect(self, address, timeout, source_address=None):
+        start = time.monotonic()
+        try:
+            infos = socket.getaddrinfo(address[0], address[1], 0, socket.SOCK_STREAM)
+        finally:
+            self._dns_seconds = time.monotonic() - start
+        err = None
+        for *_, sockaddr in infos:
+            try:
+                return socket.create_connection(sockaddr[:2], timeout, source_address)
+            except OSError as e:
+                err = e
+        raise err or OSError(f"no addresses for {address[0]}")
+
+    def connect(self):
+        start = time.monotonic()
+        try:
+            super().connect()  # for HTTPS this includes the TLS handshake
+        finally:
+            stats = getattr(_fetch_stats, "current", None)
+            if stats is not None:
+                _add_ms(stats, "dns_ms", self._dns_seconds)
+                _add_ms(stats, "connect_ms", time.monotonic() - start - self._dns_seconds)
+
+
+class _TimedHTTPConnection(_TimedConnection, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnection, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPHandler(HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(_TimedHTTPConnection, req)
+
+
+class _TimedHTTPSHandler(HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(_TimedHTTPSConnection, req, context=self._context)
+
+
+_OPENER = build_opener(_TimedHTTPHandler, _TimedHTTPSHandler)
+
+
+class _TimedReader:
+    """File-like wrapper that counts bytes and time spent in read()."""
+
+    def __init__(self, stream, stats):
+        self.stream = stream
+        self.stats = stats
+
+    def read(self, size=-1):
+        start = time.monotonic()
+        chunk = self.stream.read(size)
+        _add_ms(self.stats, "download_ms", time.monotonic() - start)
+        self.stats["bytes"] = self.stats.get("bytes", 0) + len(chunk)
+        return chunk
+
+
+def fetch_source(source, deadline=None, state=None, stats=None, item_cache=None):
+    """
+    Fetch and parse one RSS source definition.
+    Returns (list_of_FeedEntry, status_string).
+    Tries each URL in order; stops at first successful parse.
+    If `deadline` (a time.monotonic() value) is given, each attempt's timeout
+    is clipped to the time remaining and no new attempt starts after it.
+
+    Items are parsed as they stream in and filtered one at a time. Once
+    EARLY_STOP_RUN consecutive items fall before the cutoff on a feed whose
+    dates have so far been newest-first, the rest of the body is skipped.
+
+    `state` is this source's {url: record} dict from feed_sources.json. A
+    URL's stored ETag / Last-Modified are sent as conditional headers; on a
+    304 the entries parsed last time are reused. Records are updated in place.
+
+    `stats`, if given, is filled with the attempt's breakdown: "url" (the
+    URL used last), "attempts", "http_status", "bytes", "items_parsed",
+    "items_reused" (answered from `item_cache`), "items_kept" and
+    dns/connect/wait/download/parse/filter/total "_ms" durations. Stage
+    times add up across failed attempts.
+
+    `item_cache` (see load_item_cache) holds process_item() results by
+    item_key(); items found there skip the per-item work, and new results
+    are added to it.
+
+    URLs whose circuit is open are skipped ("circuit_open" if that leaves
+    none), and a source polled again before its adaptive interval is up is
+    answered from its last entries with status "idle".
+    """
+    if stats is None:
+        stats = {}
+    if state is None:
+        state = {}
+    if item_cache is None:
+        item_cache = {}
+    now = time.time()
+    poll = state.get("_poll") or {}
+    if now < poll.get("next_at", 0):
+        stats["url"] = poll.get("url")
+        entries = _recent_entries(state.get(poll.get("url")) or {}, source["tag"])
+        stats["items_kept"] = len(entries)
+        return entries, "idle"
+
+    start = time.monotonic()
+    _fetch_stats.current = stats
+    try:
+        entries, status = _fetch_urls(source, deadline, state, stats, item_cache)
+    finally:
+        _fetch_stats.current = None
+        _add_ms(stats, "total_ms", time.monotonic() - start)
+
+    if status == "ok":
+        ids = [e.id for e in entries]
+        interval = poll.get("interval", POLL_MIN)
+        if set(ids) - set(poll.get("seen", [])):
+            interval = max(POLL_MIN, interval / 2)
+        else:
+            interval = min(POLL_MAX, interval * POLL_BACKOFF)
+        state["_poll"] = {"interval": round(interval), "next_at": now + interval,
+                          "url": stats["url"], "seen": ids}
+    return entries, status
+
+
+def _recent_entries(record, source_tag):
+    """A URL record's stored entries that are still inside the 2-hour cutoff."""
+    cutoff = time.time() - 2 * 3600
+    entries = (FeedEntry.from_state(row, source_tag) for row in record.get("entries", []))
+    return [e for e in entries if e.ts >= cutoff]
+
+
+def _url_ok(record, **fields):
+    """A URL record after a successful fetch: failure history cleared."""
+    record = {k: v for k, v in record.items() if k not in ("failures", "retry_at", "last_error")}
+    record.update(fields)
+    return record
+
+
+def _url_failed(record, error, now=None):
+    """A URL record after a failed fetch, with its circuit opened if due."""
+    failures = record.get("failures", 0) + 1
+    record = dict(record, failures=failures, last_error=error[:200])
+    if failures >= BREAKER_THRESHOLD:
+        backoff = BREAKER_BACKOFF * 2 ** (failures - BREAKER_THRESHOLD)
+        record["retry_at"] = (now or time.time()) + min(BREAKER_MAX_BACKOFF, backoff)
+    return record
+
+
+def _fetch_urls(source, deadline, state, stats, item_cache):
+    cutoff = time.time() - 2 * 3600
+    last_err = "no_urls_tried"
+    skipped = 0
+
+    for url in source["urls"]:
+        record = state.get(url) or {}
+        if record.get("retry_at", 0) > time.time():
+            skipped += 1
+            continue
+        timeout = FETCH_TIMEOUT
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return [], "timeout"
+            timeout = min(timeout, remaining)
+        stats["url"] = url
+        stats["attempts"] = stats.get("attempts", 0) + 1
+        try:
+            headers = {
+                "User-Agent": "MeridianIntel/1.0 RSS Aggregator",
+                "Accept": "application/rss+xml,application/atom+xml,application/xml,text/xml,*/*",
+            }
+            if record.get("etag"):
+                headers["If-None-Match"] = record["etag"]
+            if record.get("last_modified"):
+                headers["If-Modified-Since"] = record["last_modified"]
+            req = Request(url, headers=headers)
+            opened = time.monotonic()
+            before = stats.get("dns_ms", 0) + stats.get("connect_ms", 0)
+            try:
+                resp = _OPENER.open(req, timeout=timeout)
+            except HTTPError as e:
+                stats["http_status"] = e.code
+                if e.code != 304 or "entries" not in record:
+                    raise
+                # Not modified: reuse last run's entries, re-applying the cutoff
+                entries = _recent_entries(record, source["tag"])
+                state[url] = _url_ok(record, entries=[e.to_state() for e in entries])
+                stats["items_kept"] = len(entries)
+                return entries, "ok"
+            finally:
+                # Time to response headers, less what DNS and connect took
+                after = stats.get("dns_ms", 0) + stats.get("connect_ms", 0)
+                _add_ms(stats, "wait_ms", time.monotonic() - opened - (after - before) / 1000)
+
+            stats["http_status"] = resp.status
+            with resp:
+                etag = resp.headers.get("ETag")
+                last_modified = resp.headers.get("Last-Modified")
+                length = resp.headers.get("Content-Length")
+                if length and length.isdigit() and int(length) > MAX_FEED_BYTES:
+                    raise FeedTooLarge(f"Content-Length {length} exceeds {MAX_FEED_BYTES}")
+
+                entries = []
+                older_run = 0
+                last_ts = None
+                date_ordered = True
+                download_before = stats.get("download_ms", 0)
+                items = iter_feed_items(_TimedReader(resp, stats), raw=True)
+                parsed = 0
+                reused = 0
+                now = int(time.time())
+                pulling = 0.0  # time inside the parser generator (download + parse)
+                loop_start = time.monotonic()
+                while True:
+                    pull_start = time.monotonic()
+                    item = next(items, None)
+                    pulling += time.monotonic() - pull_start
+                    if item is None:
+                        break
+                    parsed += 1
+                    key = item_key(item)
+                    result = item_cache.get(key)
+                    if result is None:
+                        result = item_cache[key] = [now, *process_item(item, cutoff)]
+                    else:
+                        result[0] = now
+                        reused += 1
+                    _, pub_ts, entry_id, priority, title, content = result
+                    if pub_ts is not None:
+                        if last_ts is not None and pub_ts > last_ts:
+                            date_ordered = False
+                        last_ts = pub_ts
+                        # Skip articles older than 2 hours if we have a date
+                        if pub_ts < cutoff:
+                            older_run += 1
+                            if date_ordered and older_run >= EARLY_STOP_RUN:
+                                break
+                            continue
+                        older_run = 0
+                    if entry_id is None:
+                        continue
+                    entries.append(FeedEntry(entry_id, pub_ts if pub_ts is not None else now, priority,
+                                             source["tag"], "media", title, content))
+                items.close()
+                download = (stats.get("download_ms", 0) - download_before) / 1000
+                _add_ms(stats, "parse_ms", max(0.0, pulling - download))
+                _add_ms(stats, "filter_ms", time.monotonic() - loop_start - pulling)
+                stats["items_parsed"] = parsed
+                stats["items_reused"] = reused
+                stats["items_kept"] = len(entries)
+
+            # Entries are kept even without validators: "idle" polls reuse them
+            state[url] = {
+                "etag": etag,
+                "last_modified": last_modified,
+                "entries": [e.to_state() for e in entries],
+            }
+            return entries, "ok"
+
+        except (URLError, HTTPError) as e:
+            last_err = f"network: {e}"
+        except ET.ParseError as e:
+            last_err = f"xml: {e}"
+        except FeedTooLarge as e:
+            last_err = f"too_large: {e}"
+        except Exception as e:
+            last_err = f"error: {e}"
+        state[url] = _url_failed(record, last_err)
+
+        if deadline is not None and time.monotonic() >= deadline:
+            return [], "timeout"
+
+    if skipped == len(source["urls"]):
+        return [], "circuit_open"
+    return [], f"error: {last_err}"
+
+
+# ─── Near-duplicate clustering ────────────────────────────────────────────────
+# MinHash signatures over title + lead-text words, bucketed by LSH bands:
+# only entries sharing a band are compared, so clustering cost grows about
+# linearly with the number of entries instead of with all pairs.
+
+MINHASH_PERMS = 32           # signature length
+LSH_BANDS = 8                # 8 bands x 4 rows: pairs above ~0.6 Jaccard collide
+DUPLICATE_THRESHOLD = 0.5    # estimated Jaccard needed to merge two entries
+CLUSTER_LEAD_WORDS = 30      # content words included in the signature
+
+PRIORITY_RANK = {"flash": 0, "urgent": 1, "routine": 2}
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or said says "
+    "that the to was were will with after over amid".split()
+)
+
+# Each word's MINHASH_PERMS independent 16-bit hashes come from one blake2b
+# digest (so MINHASH_PERMS can be at most 32), memoised per word.
+_MINHASH_STRUCT = struct.Struct(f"<{MINHASH_PERMS}H")
+_MINHASH_CACHE_MAX = 100_000
+_word_hashes = {}
+
+
+def _word_minhashes(word):
+    row = _word_hashes.get(word)
+    if row is None:
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=2 * MINHASH_PERMS).digest()
+        row = _MINHASH_STRUCT.unpack(digest)
+        if len(_word_hashes) >= _MINHASH_CACHE_MAX:
+            _word_hashes.clear()
+        _word_hashes[word] = row
+    return row
+
+
+def minhash_signature(text):
+    """MinHash signature (tuple of MINHASH_PERMS ints) of text's content words."""
+    rows = [_word_minhashes(w) for w in set(tokenize(text)) if w not in STOPWORDS]
+    if not rows:
+        return None
+    return tuple(map(min, zip(*rows)))
+
+
+def cluster_entries(entries):
+    """
+    Collapse near-duplicate FeedEntry records (the same story from several
+    sources) into one entry per cluster. The representative is a copy of the
+    highest-priority member, earliest first, with source_tags (all member
+    tags, representative first) and cluster_size set. Order of first
+    appearance is kept. Singletons are returned unchanged.
+    """
+    rows = MINHASH_PERMS // LSH_BANDS
+    sigs = []
+    buckets = {}
+    for i, e in enumerate(entries):
+        lead = " ".join(e.content.split()[:CLUSTER_LEAD_WORDS])
+        sig = minhash_signature(e.title + " " + lead)
+        sigs.append(sig)
+        if sig is None:
+            continue
+        for band in range(LSH_BANDS):
+            key = (band, sig[band * rows:(band + 1) * rows])
+            buckets.setdefault(key, []).append(i)
+
+    parent = list(range(len(entries)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        head = members[0]
+        for j in members[1:]:
+            if find(head) == find(j):
+                continue
+            same = sum(1 for x, y in zip(sigs[head], sigs[j]) if x == y)
+            if same / MINHASH_PERMS >= DUPLICATE_THRESHOLD:
+                parent[find(j)] = find(head)
+
+    clusters = {}
+    for i in range(len(entries)):
+        clusters.setdefault(find(i), []).append(entries[i])
+
+    def rep_key(e):
+        return (PRIORITY_RANK.get(e.priority, 3), e.ts)
+
+    result = []
+    for members in clusters.values():
+        if len(members) == 1:
+            result.append(members[0])
+            continue
+        rep = min(members, key=rep_key).copy()
+        tags = [rep.source_tag]
+        for m in members:
+            if m.source_tag not in tags:
+                tags.append(m.source_tag)
+        rep.source_tags = tags
+        rep.cluster_size = len(members)
+        result.append(rep)
+    return result
+
+
+# ─── Cache ────────────────────────────────────────────────────────────────────
+
+def load_cache():
+    """
+    Load feed_cache.json.
+    Returns (data_dict, age_in_seconds). age=inf if cache missing or unreadable.
+    """
+    try:
+        with open(CACHE_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        cached_at = data.get("_cached_at", 0)
+        age = time.time() - cached_at
+        return data, age
+    except Exception:
+        return None, float("inf")
+
+
+def write_atomic(path, data):
+    """
+    Write bytes to `path` via a temp file in the same directory plus
+    os.replace(), so concurrent readers see either the old or the new file.
+    The file gets FILE_MODE rather than mkstemp's owner-only 0600.
+    """
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=os.path.basename(path) + ".", suffix=".tmp",
+        dir=os.path.dirname(path),
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_path, FILE_MODE)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def save_cache(data):
+    """
+    Write data dict to feed_cache.json with a _cached_at epoch timestamp,
+    and pre-render the cache-hit responses into feed_cache.body.
+    """
+    try:
+        payload = dict(data)
+        payload["_cached_at"] = time.time()
+        write_atomic(CACHE_FILE, json.dumps(payload).encode("utf-8"))
+        save_response_cache(data, payload["_cached_at"])
+    except Exception:
+        pass  # Cache failure is non-fatal
+
+
+def gzip_etag(etag):
+    """ETag of the gzip representation of a body whose ETag is `etag`."""
+    return etag[:-1] + '-gz"'
+
+
+def save_response_cache(data, cached_at):
+    """
+    Write feed_cache.body: the finished cache-hit responses for the full
+    window and for ?since=<current cursor>, each as plain and gzip bytes.
+    Layout: one ASCII header line indexing the blobs that follow it,
+    "<expires_at> <name>=<etag>,<offset>,<plain_len>,<gzip_len> ...", kept
+    simple enough for feed.py to read without importing json.
+    """
+    hit = dict(data)
+    hit["sources_status"] = {k: "cached" for k in data.get("sources_status", {})}
+    variants = {"full": None}
+    if "cursor" in data:
+        variants[str(data["cursor"])] = data["cursor"]
+
+    index = [repr(cached_at + CACHE_TTL)]
+    blobs = []
+    offset = 0
+    for name, since in variants.items():
+        _status, headers, body = render_feed(hit, since)
+        packed = gzip.compress(body, GZIP_LEVEL)
+        index.append(f"{name}={dict(headers)['ETag']},{offset},{len(body)},{len(packed)}")
+        blobs += [body, packed]
+        offset += len(body) + len(packed)
+
+    header = " ".join(index).encode("ascii")
+    write_atomic(BODY_CACHE_FILE, header + b"\n" + b"".join(blobs))
+
+
+def load_source_state():
+    """
+    Load feed_sources.json: {source_key: {url: {"etag", "last_modified",
+    "entries", "failures", "retry_at", "last_error"}, "_poll": {"interval",
+    "next_at", "url", "seen"}}}, where "entries" holds FeedEntry.to_state()
+    rows. Returns {} if missing or unreadable.
+    """
+    try:
+        with open(SOURCE_STATE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def save_source_state(state):
+    """Atomically write the per-source validator state."""
+    try:
+        write_atomic(SOURCE_STATE_FILE, json.dumps(state).encode("utf-8"))
+    except Exception:
+        pass  # Losing validators only costs a full download next time
+
+
+# Handle returned when feed_cache.lock cannot be opened at all
+NO_LOCK = -1
+
+
+def acquire_refresh_lock(blocking=False):
+    """
+    Take the cross-process refresh lock (feed_cache.lock).
+    Returns a handle to pass to release_refresh_lock(), or None if another
+    process already holds the lock and `blocking` is False.
+    flock() needs no write access, so the file is opened read-only and a
+    lock file owned by another user still works. If it cannot be opened
+    (e.g. the project root is not writable), or without fcntl, every caller
+    gets the lock, i.e. no single-flight; the refresh itself still runs.
+    """
+    try:
+        fd = os.open(LOCK_FILE, os.O_RDONLY | os.O_CREAT, FILE_MODE)
+    except OSError:
+        return NO_LOCK
+    if fcntl is None:
+        return fd
+    try:
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        fcntl.flock(fd, flags)
+        return fd
+    except OSError:
+        os.close(fd)
+        return None
+
+
+def release_refresh_lock(handle):
+    """Release a lock handle returned by acquire_refresh_lock()."""
+    if handle == NO_LOCK:
+        return
+    if fcntl is not None:
+        fcntl.flock(handle, fcntl.LOCK_UN)
+    os.close(handle)
+
+
+# ─── Archive ──────────────────────────────────────────────────────────────────
+# Every entry that passes the filters is upserted into feed_archive.db, so
+# history survives the 2-hour cutoff and the 50-entry window. `seq` is the
+# rowid: it backs the FTS5 index and breaks ties in keyset pagination.
+
+ARCHIVE_SCHEMA_VERSION = 1
+SEARCH_DEFAULT_LIMIT = 50
+SEARCH_MAX_LIMIT = 200
+
+ARCHIVE_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS entries (
+    seq          INTEGER PRIMARY KEY,
+    id           TEXT    NOT NULL UNIQUE,
+    ts           INTEGER NOT NULL,
+    time         TEXT    NOT NULL,
+    priority     TEXT,
+    source_tag   TEXT,
+    source_class TEXT,
+    title        TEXT,
+    content      TEXT,
+    first_seen   INTEGER,
+    last_seen    INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_entries_ts          ON entries (ts);
+CREATE INDEX IF NOT EXISTS idx_entries_source_ts   ON entries (source_tag, ts);
+CREATE INDEX IF NOT EXISTS idx_entries_priority_ts ON entries (priority, ts);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+    title, content, content='entries', content_rowid='seq', prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts (rowid, title, content) VALUES (new.seq, new.title, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, title, content)
+    VALUES ('delete', old.seq, old.title, old.content);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_au AFTER UPDATE OF title, content ON entries
+WHEN old.title IS NOT new.title OR old.content IS NOT new.content BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, title, content)
+    VALUES ('delete', old.seq, old.title, old.content);
+    INSERT INTO entries_fts (rowid, title, content) VALUES (new.seq, new.title, new.content);
+END;
+"""
+
+UPSERT_ENTRY_SQL = """
+INSERT INTO entries (id, ts, time, priority, source_tag, source_class, title, content,
+                     first_seen, last_seen)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    priority  = excluded.priority,
+    title     = excluded.title,
+    content   = excluded.content,
+    last_seen = excluded.last_seen
+"""
+
+
+def get_archive_db():
+    """Open feed_archive.db in WAL mode, creating the schema on first use."""
+    db = sqlite3.connect(ARCHIVE_DB, timeout=10)
+    db.row_factory = sqlite3.Row
+    if db.execute("PRAGMA user_version").fetchone()[0] < ARCHIVE_SCHEMA_VERSION:
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(ARCHIVE_SCHEMA_SQL)
+        db.execute(f"PRAGMA user_version={ARCHIVE_SCHEMA_VERSION}")
+        db.commit()
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+
+def archive_entries(entries):
+    """Upsert FeedEntry records into the archive in one transaction (non-fatal)."""
+    now = int(time.time())
+    rows = [
+        (e.id, e.ts, e.iso_time(), e.priority, e.source_tag, e.source_class,
+         e.title, e.content, now, now)
+        for e in entries
+    ]
+    try:
+        db = get_archive_db()
+        try:
+            with db:
+                db.executemany(UPSERT_ENTRY_SQL, rows)
+        finally:
+            db.close()
+    except sqlite3.Error:
+        pass  # The live feed must not depend on the archive
+
+
+def fts_query(q):
+    """
+    Turn free text into an FTS5 query: every word must match, and a
+    trailing * makes a word a prefix search. FTS syntax in `q` is not
+    interpreted, so user input can never produce a query error.
+    """
+    terms = []
+    for word in q.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*").replace('"', "")
+        if word:
+            terms.append('"%s"%s' % (word, "*" if prefix else ""))
+    return " ".join(terms)
+
+
+def parse_time_param(value):
+    """Epoch seconds from an epoch number or an ISO 8601 / RFC 2822 date."""
+    if value is None or value == "":
+        return None
+    if value.isdigit():
+        return int(value)
+    dt = parse_date(value)
+    if dt is None:
+        raise ValueError(f"bad time: {value}")
+    return int(dt.timestamp())
+
+
+def search_archive(params):
+    """
+    Query the archive. `params` (all optional): q (full-text), source,
+    priority, from / to (time range, epoch or ISO), limit, cursor.
+
+    Without q, results are newest first by entry time, paged on (ts, seq)
+    through the ts / source / priority indexes. With q, the FTS5 index
+    drives the query in descending seq (newest archived first) and the
+    other filters are applied per match, so a common term stops after
+    one page instead of sorting every match. Pass the returned
+    "next_cursor" back as `cursor` for the next page.
+    """
+    try:
+        limit = int(params.get("limit") or SEARCH_DEFAULT_LIMIT)
+    except ValueError:
+        limit = SEARCH_DEFAULT_LIMIT
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+
+    where, args = [], []
+    q = fts_query(params.get("q", ""))
+    if q:
+        # CROSS JOIN keeps entries_fts as the outer loop
+        tables = "entries_fts CROSS JOIN entries e ON e.seq = entries_fts.rowid"
+        where.append("entries_fts MATCH ?")
+        args.append(q)
+        order = "entries_fts.rowid DESC"
+    else:
+        tables = "entries e"
+        order = "e.ts DESC, e.seq DESC"
+    if params.get("source"):
+        where.append("e.source_tag = ?")
+        args.append(params["source"].upper())
+    if params.get("priority"):
+        where.append("e.priority = ?")
+        args.append(params["priority"].lower())
+    start = parse_time_param(params.get("from"))
+    if start is not None:
+        where.append("e.ts >= ?")
+        args.append(start)
+    end = parse_time_param(params.get("to"))
+    if end is not None:
+        where.append("e.ts < ?")
+        args.append(end)
+    if params.get("cursor"):
+        ts, _, seq = params["cursor"].partition(":")
+        if q:
+            where.append("entries_fts.rowid < ?")
+            args.append(int(seq))
+        else:
+            where.append("(e.ts, e.seq) < (?, ?)")
+            args += [int(ts), int(seq)]
+
+    sql = (
+        f"SELECT e.seq, e.id, e.ts, e.time, e.priority, e.source_tag, e.source_class, "
+        f"e.title, e.content FROM {tables}"
+        + (" WHERE " + " AND ".join(where) if where else "")
+        + f" ORDER BY {order} LIMIT ?"
+    )
+    db = get_archive_db()
+    try:
+        rows = db.execute(sql, args + [limit + 1]).fetchall()
+    finally:
+        db.close()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f"{rows[-1]['ts']}:{rows[-1]['seq']}"
+    entries = [{
+        "id": r["id"],
+        "time": r["time"],
+        "time_display": format_display(datetime.fromisoformat(r["time"]).astimezone(IST)),
+        "priority": r["priority"],
+        "source_tag": r["source_tag"],
+        "source_class": r["source_class"],
+        "title": r["title"],
+        "content": r["content"],
+    } for r in rows]
+    return {
+        "status": "ok",
+        "count": len(entries),
+        "entries": entries,
+        "next_cursor": next_cursor,
+    }
+
+
+# ─── Metrics ──────────────────────────────────────────────────────────────────
+# Every CGI process appends one line per event ("hit", "miss", ...) to
+# feed_metrics.log with O_APPEND, which needs no lock. The refresh, already
+# single-flight under feed_cache.lock, folds the log into the counters and
+# histograms in feed_metrics.json. A line written in the instant between a
+# writer's open() and the compactor's rename can be lost; for metrics that is
+# an acceptable trade for lock-free requests. server.py counts in memory and
+# appends its totals once per refresh as "<event> <count>" lines.
+
+REQUEST_RESULTS = ("hit", "stale", "miss", "error")
+REFRESH_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 16)   # seconds
+SOURCE_STAGES = ("dns", "connect", "wait", "download", "parse", "filter", "total")
+REFRESH_STAGES = ("fetch", "archive", "cluster", "sort", "total")
+
+
+def record_metric(event):
+    """Append one event line to the metrics log (non-fatal)."""
+    _append_metrics(event.encode("ascii") + b"\n")
+
+
+def record_metrics(counts):
+    """Append {event: count} to the metrics log in one write (non-fatal)."""
+    if counts:
+        _append_metrics("".join(f"{event} {n}\n" for event, n in counts.items()).encode("ascii"))
+
+
+def _append_metrics(data):
+    try:
+        fd = os.open(METRICS_LOG_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+def load_metrics_state():
+    try:
+        with open(METRICS_STATE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {"events": {}, "refresh": None, "sources": {}}
+
+
+def _read_metric_events(path, events):
+    try:
+        with open(path, "rb") as f:
+            for line in f:
+                name, _, count = line.strip().decode("ascii", "replace").partition(" ")
+                if name:
+                    events[name] = events.get(name, 0) + (int(count) if count.isdigit() else 1)
+    except FileNotFoundError:
+        pass
+
+
+def _observe(histogram, seconds):
+    if histogram is None:
+        histogram = {"buckets": [0] * len(REFRESH_BUCKETS), "sum": 0.0, "count": 0}
+    for i, bound in enumerate(REFRESH_BUCKETS):
+        if seconds <= bound:
+            histogram["buckets"][i] += 1
+    histogram["sum"] = round(histogram["sum"] + seconds, 6)
+    histogram["count"] += 1
+    return histogram
+
+
+def compact_metrics(refresh_seconds=None, source_stats=None):
+    """
+    Fold the metrics log and one refresh's timings into feed_metrics.json.
+    Call only while holding the refresh lock.
+    """
+    pending = METRICS_LOG_FILE + ".compacting"
+    try:
+        if not os.path.exists(pending):  # else: left over from a crashed run
+            try:
+                os.replace(METRICS_LOG_FILE, pending)
+            except FileNotFoundError:
+                pass
+        state = load_metrics_state()
+        _read_metric_events(pending, state["events"])
+        if refresh_seconds is not None:
+            state["refresh"] = _observe(state.get("refresh"), refresh_seconds)
+        for key, st in (source_stats or {}).items():
+            if "total_ms" in st:
+                state["sources"][key] = _observe(state["sources"].get(key), st["total_ms"] / 1000)
+        write_atomic(METRICS_STATE_FILE, json.dumps(state).encode("utf-8"))
+        os.remove(pending)
+    except OSError:
+        pass  # Metrics must never break a refresh
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _histogram_lines(name, histogram, labels=""):
+    sep = "," if labels else ""
+    lines = []
+    for bound, count in zip(REFRESH_BUCKETS, histogram["buckets"]):
+        lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {count}')
+    lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {histogram["count"]}')
+    lines.append(f"{name}_sum{{{labels}}} {histogram['sum']}" if labels else f"{name}_sum {histogram['sum']}")
+    lines.append(f"{name}_count{{{labels}}} {histogram['count']}" if labels else f"{name}_count {histogram['count']}")
+    return lines
+
+
+def render_metrics(pending=None):
+    """
+    Prometheus text exposition: request counters and refresh histograms
+    from feed_metrics.json plus events not yet compacted (and `pending`,
+    counts a caller holds in memory), and the last refresh's per-source
+    breakdown from feed_cache.json.
+    """
+    state = load_metrics_state()
+    events = state["events"]
+    for path in (METRICS_LOG_FILE + ".compacting", METRICS_LOG_FILE):
+        _read_metric_events(path, events)
+    for name, count in (pending or {}).items():
+        events[name] = events.get(name, 0) + count
+    cached, age = load_cache()
+    cached = cached or {}
+
+    out = [
+        "# HELP meridian_feed_requests_total Feed requests by cache outcome.",
+        "# TYPE meridian_feed_requests_total counter",
+    ]
+    out += [f'meridian_feed_requests_total{{cache="{r}"}} {events.get(r, 0)}' for r in REQUEST_RESULTS]
+    out += [
+        "# HELP meridian_feed_not_modified_total Feed requests answered 304 Not Modified.",
+        "# TYPE meridian_feed_not_modified_total counter",
+        f"meridian_feed_not_modified_total {events.get('not_modified', 0)}",
+        "# HELP meridian_feed_refresh_duration_seconds Wall time of build_feed().",
+        "# TYPE meridian_feed_refresh_duration_seconds histogram",
+    ]
+    if state.get("refresh"):
+        out += _histogram_lines("meridian_feed_refresh_duration_seconds", state["refresh"])
+    out += [
+        "# HELP meridian_feed_source_fetch_duration_seconds Wall time of fetch_source() per source.",
+        "# TYPE meridian_feed_source_fetch_duration_seconds histogram",
+    ]
+    for key, histogram in sorted(state["sources"].items()):
+        out += _histogram_lines("meridian_feed_source_fetch_duration_seconds", histogram, f'source="{_label(key)}"')
+
+    if age != float("inf"):
+        out += [
+            "# HELP meridian_feed_cache_age_seconds Age of feed_cache.json.",
+            "# TYPE meridian_feed_cache_age_seconds gauge",
+            f"meridian_feed_cache_age_seconds {age:.3f}",
+        ]
+    refresh = cached.get("_refresh", {})
+    out += [
+        "# HELP meridian_feed_refresh_stage_seconds Stage durations of the last refresh.",
+        "# TYPE meridian_feed_refresh_stage_seconds gauge",
+    ]
+    out += [
+        f'meridian_feed_refresh_stage_seconds{{stage="{stage}"}} {refresh[stage + "_ms"] / 1000}'
+        for stage in REFRESH_STAGES if stage + "_ms" in refresh
+    ]
+    sources = cached.get("_source_stats", {})
+    gauges = [
+        ("meridian_feed_source_stage_seconds", "Per-source stage durations of the last refresh.",
+         lambda st: [(f'stage="{stage}"', st[stage + "_ms"] / 1000) for stage in SOURCE_STAGES if stage + "_ms" in st]),
+        ("meridian_feed_source_bytes", "Bytes downloaded per source in the last refresh.",
+         lambda st: [("", st.get("bytes", 0))]),
+        ("meridian_feed_source_items", "Items per source in the last refresh: parsed, reused from the item cache, kept.",
+         lambda st: [(f'kind="{kind}"', st[f"items_{kind}"]) for kind in ("parsed", "reused", "kept") if f"items_{kind}" in st]),
+        ("meridian_feed_source_info", "Status and URL used per source in the last refresh.",
+         lambda st: [(f'status="{_label(st.get("status", "").split(":")[0])}",url="{_label(st.get("url", ""))}",'
+                      f'http_status="{st.get("http_status", "")}",attempts="{st.get("attempts", 0)}"', 1)]),
+    ]
+    for name, help_text, samples in gauges:
+        out += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        for key, st in sorted(sources.items()):
+            for labels, value in samples(st):
+                sep = "," if labels else ""
+                out.append(f'{name}{{source="{_label(key)}"{sep}{labels}}} {value}')
+    return "\n".join(out) + "\n"
+
+
+# ─── Feed builder ─────────────────────────────────────────────────────────────
+
+def fetch_all_sources(sources, budget=None, state=None, stats=None, item_cache=None):
+    """
+    Fetch every source concurrently under one overall time budget.
+    Returns {source_key: (list_of_entries, status_string)}. Sources that have
+    not finished when the budget runs out are reported as "timeout"; their
+    worker threads are daemonic, so they never hold up the response.
+
+    If `state` (see load_source_state) is given, each worker gets a private
+    copy of its source's records and finished sources are merged back, so a
+    late worker can never mutate `state` after this returns.
+
+    If `stats` is given, it receives each source's fetch_source() stats
+    plus its "status"; unfinished sources get a snapshot of what they had
+    recorded so far.
+
+    `item_cache` (see load_item_cache) is shared by all workers.
+    """
+    if budget is None:
+        budget = FETCH_DEADLINE
+    deadline = time.monotonic() + budget
+    results = {}
+    if state is None:
+        state = {}
+    worker_state = {s["key"]: dict(state.get(s["key"], {})) for s in sources}
+    worker_stats = {s["key"]: {} for s in sources}
+
+    def worker(source):
+        key = source["key"]
+        results[key] = fetch_source(source, deadline, worker_state[key], worker_stats[key], item_cache)
+
+    threads = []
+    for source in sources:
+        t = threading.Thread(target=worker, args=(source,), daemon=True)
+        t.start()
+        threads.append(t)
+
+    for t in threads:
+        t.join(max(0.0, deadline - time.monotonic()))
+
+    # Snapshot now: late workers may still write into `results`.
+    fetched = {}
+    for s in sources:
+        key = s["key"]
+        if key in results:
+            fetched[key] = results[key]
+            state[key] = worker_state[key]
+        else:
+            fetched[key] = ([], "timeout")
+            # The URL still in flight at the deadline counts as a failure
+            url = worker_stats[key].get("url")
+            if url is not None:
+                state[key] = dict(state.get(key, {}))
+                state[key][url] = _url_failed(state[key].get(url) or {}, "timeout")
+        if stats is not None:
+            stats[key] = dict(worker_stats[key], status=fetched[key][1])
+    return fetched
+
+
+# Fields whose change makes an entry count as "changed" for ?since= deltas
+REVISION_FIELDS = ("title", "content", "priority", "source_tag", "source_class",
+                   "source_tags")
+
+
+def build_feed(previous=None):
+    """
+    Fetch all configured RSS sources, merge with baseline entries,
+    deduplicate, collapse near-duplicate stories, take the FEED_WINDOW
+    newest, and return the response dict.
+
+    `previous` is the last payload (e.g. the stale cache). It is used to
+    version the feed: every entry carries the "rev" (cursor value) at which
+    it was added or last changed, ids that left the window are kept as
+    tombstones, and "cursor" only advances when the window changed.
+    """
+    sources_status = {}
+    all_entries = []
+    seen_ids = set()
+    started = time.monotonic()
+    stages = {}
+    source_stats = {}
+
+    source_state = load_source_state()
+    item_cache = load_item_cache()
+    fetched = fetch_all_sources(RSS_SOURCES, state=source_state, stats=source_stats, item_cache=item_cache)
+    save_source_state(source_state)
+    save_item_cache(item_cache)
+    _add_ms(stages, "fetch_ms", time.monotonic() - started)
+    for source in RSS_SOURCES:
+        entries, status = fetched[source["key"]]
+        sources_status[source["key"]] = status
+        for e in entries:
+            if e.id not in seen_ids:
+                seen_ids.add(e.id)
+                all_entries.append(e)
+
+    # Always include baseline entries as fallback content
+    for e in BASELINE_ENTRIES:
+        if e["id"] not in seen_ids:
+            seen_ids.add(e["id"])
+            all_entries.append(FeedEntry.from_dict(e))
+
+    mark = time.monotonic()
+    archive_entries(all_entries)
+    _add_ms(stages, "archive_ms", time.monotonic() - mark)
+
+    # The same story from several publishers becomes one entry
+    mark = time.monotonic()
+    all_entries = cluster_entries(all_entries)
+    _add_ms(stages, "cluster_ms", time.monotonic() - mark)
+    mark = time.monotonic()
+
+    previous = previous or {}
+    prev_cursor = previous.get("cursor", 0)
+    cursor = prev_cursor + 1
+    prev_by_id = {e["id"]: e for e in previous.get("entries", [])}
+    kept = {}
+    for e in all_entries:
+        old = prev_by_id.get(e.id)
+        if old is not None and all(old.get(f) == getattr(e, f) for f in REVISION_FIELDS):
+            # Unchanged: keep the old entry (and its time, for undated items)
+            kept[e.id] = old
+            e.ts = parse_ts(old.get("time"), e.ts)
+
+    # Newest first. Only the window is kept, so a bounded heap selection
+    # replaces sorting every candidate; only the window is formatted.
+    window = heapq.nlargest(FEED_WINDOW, all_entries, key=attrgetter("ts"))
+    all_entries = []
+    for e in window:
+        old = kept.get(e.id)
+        if old is not None:
+            all_entries.append(dict(old, rev=old.get("rev", cursor)))
+        else:
+            all_entries.append(dict(e.to_dict(), rev=cursor))
+
+    window_ids = {e["id"] for e in all_entries}
+    removed = [i for i in prev_by_id if i not in window_ids]
+    changed = bool(removed) or any(e["rev"] == cursor for e in all_entries)
+    if not changed:
+        cursor = prev_cursor
+    horizon = max(0, cursor - TOMBSTONE_REVS)
+    tombstones = {
+        i: rev for i, rev in previous.get("_tombstones", {}).items()
+        if rev > horizon and i not in window_ids
+    }
+    for i in removed:
+        tombstones[i] = cursor
+
+    _add_ms(stages, "sort_ms", time.monotonic() - mark)
+    _add_ms(stages, "total_ms", time.monotonic() - started)
+    compact_metrics(stages["total_ms"] / 1000, source_stats)
+
+    n = now_ist()
+    updated = n.isoformat() if changed else previous.get("updated", n.isoformat())
+    return {
+        "status": "ok",
+        "cursor": cursor,
+        "updated": updated,
+        "updated_display": format_display(datetime.fromisoformat(updated)),
+        "entry_count": len(all_entries),
+        "entries": all_entries,
+        "sources_status": sources_status,
+        "_tombstones": tombstones,
+        "_horizon": horizon,
+        "_refresh": stages,
+        "_source_stats": source_stats,
+    }
+
+
+def render_feed(payload, since=None, if_none_match=None):
+    """
+    Serialize a feed payload for the wire. Returns (status, headers, body).
+
+    Keys starting with "_" are internal and never sent. With `since` (a
+    cursor from an earlier response) inside the tombstone horizon, only
+    entries with rev > since are sent, plus the ids "removed" from the
+    window; otherwise the full window is sent. The body is UTF-8 bytes,
+    the strong ETag is derived from it, and a matching If-None-Match
+    yields a 304.
+    """
+    out = {k: v for k, v in payload.items() if not k.startswith("_")}
+    try:
+        since = int(since) if since is not None else None
+    except ValueError:
+        since = None
+    cursor = payload.get("cursor")
+    if since is not None and cursor is not None and payload.get("_horizon", 0) <= since <= cursor:
+        out["delta"] = True
+        out["since"] = since
+        out["entries"] = [e for e in payload["entries"] if e.get("rev", 0) > since]
+        out["removed"] = sorted(
+            i for i, rev in payload.get("_tombstones", {}).items() if rev > since
+        )
+
+    body = json.dumps(out, ensure_ascii=False).encode("utf-8")
+    etag = '"%s"' % hashlib.sha1(body).hexdigest()[:20]
+    headers = [("ETag", etag)]
+    if etag_matches(etag, if_none_match):
+        return 304, headers, b""
+    return 200, headers, body
+
+
+def etag_matches(etag, if_none_match):
+    """True if an If-None-Match header value matches `etag`."""
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return etag in tags or "*" in tags
+
+
+# ─── CGI entry point ──────────────────────────────────────────────────────────
+
+def cached_payload(cached, stale_age=None):
+    """Prepare a cached payload for serving, flagged stale with its age if given."""
+    # Mark all source statuses as "cached"
+    if "sources_status" in cached:
+        for k in list(cached["sources_status"].keys()):
+            cached["sources_status"][k] = "cached"
+    cached.pop("_cached_at", None)
+    if stale_age is not None:
+        cached["stale"] = True
+        cached["stale_age"] = int(stale_age)
+    return cached
+
+
+def load_feed_payload():
+    """Return the payload to serve: fresh cache, stale cache, or a new build."""
+    # Try to serve from cache if still fresh
+    cached, age = load_cache()
+    if cached is not None and age < CACHE_TTL:
+        record_metric("hit")
+        return cached_payload(cached)
+
+    # Cache is stale or missing — only one process refreshes at a time
+    lock = acquire_refresh_lock()
+    if lock is None:
+        if cached is not None:
+            # Someone else is refreshing: serve the stale copy meanwhile
+            record_metric("stale")
+            return cached_payload(cached, stale_age=age)
+        # Cold start: wait for the refresher instead of crawling too
+        lock = acquire_refresh_lock(blocking=True)
+
+    try:
+        # The previous lock holder may have just refreshed the cache
+        cached, age = load_cache()
+        if cached is not None and age < CACHE_TTL:
+            record_metric("hit")
+            return cached_payload(cached)
+
+        record_metric("miss")
+        response = build_feed(previous=cached)
+        save_cache(response)
+    finally:
+        release_refresh_lock(lock)
+    return response
+
+
+# Sent with every feed response. feed.py cannot import this module on its
+# cache-hit path, so write_cached_response() there keeps a copy of this list
+# and of the ETag/304 logic below; change both together.
+FEED_RESPONSE_HEADERS = (
+    "Content-Type: application/json",
+    "Access-Control-Allow-Origin: *",
+    "Access-Control-Allow-Headers: If-None-Match",
+    "Access-Control-Expose-Headers: ETag",
+    "Cache-Control: no-cache",
+    "Vary: Accept-Encoding",
+)
+
+
+def write_feed_response(etag, plain, packed=None, if_none_match=None):
+    """
+    Write CGI headers and body bytes straight to stdout. `packed` is the
+    gzip variant, sent (with its own ETag) when the client accepts gzip.
+    feed.write_cached_response() mirrors this for cache hits.
+    """
+    body = plain
+    headers = list(FEED_RESPONSE_HEADERS)
+    if packed is not None:
+        body = packed
+        etag = gzip_etag(etag)
+        headers.append("Content-Encoding: gzip")
+    headers.append(f"ETag: {etag}")
+    if etag_matches(etag, if_none_match):
+        headers.insert(0, "Status: 304 Not Modified")
+        body = b""
+        record_metric("not_modified")
+    headers.append(f"Content-Length: {len(body)}")
+
+    out = sys.stdout.buffer
+    out.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1"))
+    out.write(body)
+    out.flush()
+
+
+def write_json_response(obj):
+    """Write an uncached JSON response (non-feed actions)."""
+    body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+    headers = [
+        "Content-Type: application/json",
+        "Access-Control-Allow-Origin: *",
+        "Cache-Control: no-cache, no-store",
+        f"Content-Length: {len(body)}",
+    ]
+    out = sys.stdout.buffer
+    out.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1"))
+    out.write(body)
+    out.flush()
+
+
+def write_metrics_response(text):
+    """Write the Prometheus text exposition."""
+    body = text.encode("utf-8")
+    headers = [
+        "Content-Type: text/plain; version=0.0.4; charset=utf-8",
+        "Cache-Control: no-cache, no-store",
+        f"Content-Length: {len(body)}",
+    ]
+    out = sys.stdout.buffer
+    out.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1"))
+    out.write(body)
+    out.flush()
+
+
+def main():
+    params = dict(parse_qsl(os.environ.get("QUERY_STRING", "")))
+    if params.get("action") == "metrics":
+        write_metrics_response(render_metrics())
+        return
+    if params.get("action") == "search":
+        try:
+            write_json_response(search_archive(params))
+        except Exception as e:
+            write_json_response({"status": "error", "error": str(e)})
+        return
+
+    # feed.py has already tried feed_cache.body for this request
+    since = params.get("since")
+    if_none_match = os.environ.get("HTTP_IF_NONE_MATCH")
+    accept_gzip = "gzip" in os.environ.get("HTTP_ACCEPT_ENCODING", "")
+
+    try:
+        payload = load_feed_payload()
+    except Exception as e:
+        # Last-resort error response — always includes baseline entries
+        record_metric("error")
+        n = now_ist()
+        payload = {
+            "status": "error",
+            "error": str(e),
+            "updated": n.isoformat(),
+            "updated_display": format_display(n),
+            "entry_count": len(BASELINE_ENTRIES),
+            "entries": BASELINE_ENTRIES,
+            "sources_status": {s["key"]: "error" for s in RSS_SOURCES},
+        }
+
+    _status, headers, plain = render_feed(payload, since)
+    packed = gzip.compress(plain, GZIP_LEVEL) if accept_gzip else None
+    write_feed_response(dict(headers)["ETag"], plain, packed, if_none_match)
+
+
+if __name__ == "__main__":
+    main()
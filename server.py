@@ -0,0 +1,549 @@
+#!/usr/bin/env python3
+"""
+MERIDIAN INTEL — Persistent Feed & Analytics Server
+
+Long-running alternative to `python -m http.server --cgi`. Serves the static
+dashboard plus the same JSON contracts as /cgi-bin/feed.py and
+/cgi-bin/analytics.py, but from memory:
+
+  - a background task runs build_feed() every CACHE_TTL seconds, so feed
+    requests never trigger RSS fetches;
+  - the analytics summary is recomputed every SUMMARY_INTERVAL seconds;
+  - pageviews and heartbeats go through one database worker thread;
+  - analytics retention runs every RETENTION_INTERVAL seconds;
+  - /cgi-bin/events is a Server-Sent Events stream: every feed refresh and
+    every changed summary is pushed to all open connections, and each open
+    connection counts as an active-session heartbeat;
+  - /cgi-bin/analytics.py?action=export streams with chunked transfer
+    encoding, reading each chunk on the export's own thread.
+
+The CGI scripts keep working on their own; this server also writes
+feed_cache.json, so a CGI fallback starts warm.
+
+Usage: python server.py [--host 0.0.0.0] [--port 8000]
+"""
+
+import argparse
+import asyncio
+import gzip
+import importlib.util
+import json
+import mimetypes
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, unquote
+
+try:
+    import resource
+except ImportError:  # non-POSIX: keep the default descriptor limit
+    resource = None
+
+PROJECT_DIR = os.path.dirname(os.path.realpath(__file__))
+CGI_DIR = os.path.join(PROJECT_DIR, "cgi-bin")
+
+SUMMARY_INTERVAL = 10    # seconds between analytics summary recomputes
+RETENTION_INTERVAL = 3600  # seconds between analytics retention runs
+MAX_BODY = 64 * 1024     # bytes accepted in a request body
+CGI_BIN_PLACEHOLDER = b"'__CGI_BIN__'"
+LISTEN_BACKLOG = 4096    # pending connections; bursts of reconnecting streams
+
+EVENTS_PATH = "/cgi-bin/events"
+EVENTS_MAX_CLIENTS = 50000     # open streams; more get 503 and fall back to polling
+EVENTS_PING_INTERVAL = 30      # seconds between keep-alive comments
+EVENTS_HEARTBEAT_INTERVAL = 120  # seconds between heartbeats for open streams
+EVENTS_MAX_BUFFER = 256 * 1024   # unsent bytes before a stalled client is dropped
+EVENTS_RETRY_MS = 5000         # client reconnect delay
+
+# The only files served from the project root. Everything else there is
+# private: databases, caches, spools, state files and the code itself.
+STATIC_FILES = ("index.html", "app.js")
+STATIC_SUFFIXES = (".css",)
+
+JSON_HEADERS = [
+    ("Content-Type", "application/json"),
+    ("Access-Control-Allow-Origin", "*"),
+    ("Cache-Control", "no-cache, no-store"),
+]
+
+# Feed responses carry an ETag, so they may be stored but must be revalidated
+FEED_HEADERS = [
+    ("Content-Type", "application/json"),
+    ("Access-Control-Allow-Origin", "*"),
+    ("Access-Control-Allow-Headers", "If-None-Match"),
+    ("Access-Control-Expose-Headers", "ETag"),
+    ("Cache-Control", "no-cache"),
+]
+
+# No Content-Length: the stream ends when either side closes the connection
+EVENTS_HEADERS = [
+    ("Content-Type", "text/event-stream; charset=utf-8"),
+    ("Access-Control-Allow-Origin", "*"),
+    ("Cache-Control", "no-cache, no-store"),
+    ("X-Accel-Buffering", "no"),
+    ("Connection", "close"),
+]
+
+EXPORT_HEADERS = [
+    ("Access-Control-Allow-Origin", "*"),
+    ("Cache-Control", "no-store"),
+    ("Transfer-Encoding", "chunked"),
+    ("Connection", "close"),
+]
+
+METRICS_HEADERS = [
+    ("Content-Type", "text/plain; version=0.0.4; charset=utf-8"),
+    ("Cache-Control", "no-cache, no-store"),
+]
+
+REASONS = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+def load_cgi_module(name):
+    """Import cgi-bin/<name>.py as a module (the directory is not a package)."""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(CGI_DIR, name + ".py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+feed = load_cgi_module("feed_engine")
+analytics = load_cgi_module("analytics_engine")
+
+
+def json_body(obj):
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def sse_message(event, data, event_id=None):
+    """Frame one Server-Sent Event. `data` is JSON bytes, so it has no newlines."""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return (head + f"event: {event}\n").encode("utf-8") + b"data: " + data + b"\n\n"
+
+
+def raise_fd_limit():
+    """Lift the soft open-files limit to the hard limit; every stream holds a socket."""
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):
+            pass
+
+
+# ─── Request / response plumbing ──────────────────────────────────────────────
+
+class Request:
+    __slots__ = ("method", "path", "query", "headers", "body")
+
+    def __init__(self, method, path, query, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+
+
+async def read_request(reader):
+    """Parse one HTTP/1.x request. Returns (Request, version) or None on EOF."""
+    line = await reader.readline()
+    if not line:
+        return None
+    method, target, version = line.decode("latin-1").split()
+    headers = {}
+    while True:
+        h = await reader.readline()
+        if h in (b"\r\n", b"\n", b""):
+            break
+        k, _, v = h.decode("latin-1").partition(":")
+        headers[k.strip().lower()] = v.strip()
+    length = int(headers.get("content-length") or 0)
+    if length > MAX_BODY:
+        raise ValueError("body too large")
+    body = await reader.readexactly(length) if length else b""
+    path, _, query = target.partition("?")
+    return Request(method.upper(), unquote(path), query, headers, body), version
+
+
+def write_response(writer, status, headers, body, keep_alive, head_only=False):
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}"]
+    lines += [f"{k}: {v}" for k, v in headers]
+    lines.append(f"Content-Length: {len(body)}")
+    lines.append("Connection: " + ("keep-alive" if keep_alive else "close"))
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+    if not head_only:
+        writer.write(body)
+
+
+# ─── Server ───────────────────────────────────────────────────────────────────
+
+class MeridianServer:
+    def __init__(self):
+        self.feed_data = None
+        self.feed_renders = {}   # ?since= value -> (etag, body), per refresh
+        self.feed_ready = asyncio.Event()
+        self.summary_body = None
+        self.event_clients = {}  # StreamWriter -> session id, one per open stream
+        self.metric_counts = {}  # feed metric events since the last refresh
+        # One thread owns all SQLite writes and summary reads, so requests
+        # in this process never contend with each other for the DB lock.
+        self.db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db")
+
+    # ── Background tasks ──────────────────────────────────────────────────────
+
+    def load_warm_cache(self):
+        """Seed the in-memory feed from feed_cache.json, if there is one."""
+        cached, _age = feed.load_cache()
+        if cached is not None:
+            cached.pop("_cached_at", None)
+            self.set_feed(cached)
+
+    def set_feed(self, payload):
+        previous = self.feed_data
+        self.feed_data = payload
+        self.feed_renders = {}
+        self.feed_ready.set()
+        # An unchanged cursor means only sources_status moved; streams can wait
+        if previous is not None and payload.get("cursor") != previous.get("cursor"):
+            # Every open stream is at the previous cursor, so one delta fits all
+            self.broadcast(self.feed_event(previous.get("cursor")))
+
+    def refresh_feed_sync(self, metric_counts=None):
+        """Rebuild the feed under the shared refresh lock; return the payload."""
+        lock = feed.acquire_refresh_lock(blocking=True)
+        try:
+            # Logged under the lock so this refresh's compaction picks them up
+            feed.record_metrics(metric_counts)
+            # A CGI fallback process may have refreshed more recently than us
+            cached, _age = feed.load_cache()
+            response = feed.build_feed(previous=cached or self.feed_data)
+            feed.save_cache(response)
+        finally:
+            feed.release_refresh_lock(lock)
+        response.pop("_cached_at", None)
+        return response
+
+    async def feed_refresher(self):
+        while True:
+            try:
+                counts, self.metric_counts = self.metric_counts, {}
+                self.set_feed(await asyncio.to_thread(self.refresh_feed_sync, counts))
+            except Exception as e:
+                print(f"[meridian] feed refresh failed: {e}", file=sys.stderr)
+            await asyncio.sleep(feed.CACHE_TTL)
+
+    def count_metric(self, event):
+        """Count a feed metric event in memory; feed_refresher logs the totals."""
+        self.metric_counts[event] = self.metric_counts.get(event, 0) + 1
+
+    def render_feed(self, since):
+        """
+        Return (etag, plain, gzipped) for a ?since= value. Rendered and
+        compressed once per refresh, then served from memory. A since
+        outside the tombstone horizon gets the full feed, so it is keyed
+        as None and junk values cannot fill the cache.
+        """
+        try:
+            since = int(since) if since is not None else None
+        except ValueError:
+            since = None
+        cursor = self.feed_data.get("cursor")
+        if since is not None and (cursor is None or not self.feed_data.get("_horizon", 0) <= since <= cursor):
+            since = None
+        rendered = self.feed_renders.get(since)
+        if rendered is None:
+            _status, headers, body = feed.render_feed(self.feed_data, since)
+            rendered = (dict(headers)["ETag"], body, gzip.compress(body, feed.GZIP_LEVEL))
+            if len(self.feed_renders) < 256:
+                self.feed_renders[since] = rendered
+        return rendered
+
+    async def summary_refresher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                summary = await loop.run_in_executor(self.db_executor, analytics.handle_summary)
+                body = json_body(summary)
+                if body != self.summary_body:
+                    self.summary_body = body
+                    self.broadcast(sse_message("summary", body))
+            except Exception as e:
+                print(f"[meridian] summary refresh failed: {e}", file=sys.stderr)
+            await asyncio.sleep(SUMMARY_INTERVAL)
+
+    async def retention_runner(self):
+        while True:
+            # Off the db thread: retention works in small transactions and
+            # must not queue pageviews and heartbeats behind it.
+            try:
+                await asyncio.to_thread(analytics.run_retention)
+            except Exception as e:
+                print(f"[meridian] analytics retention failed: {e}", file=sys.stderr)
+            await asyncio.sleep(RETENTION_INTERVAL)
+
+    async def event_pinger(self):
+        # A comment line keeps idle streams open through proxies and lets
+        # the transport notice clients that went away without a FIN.
+        while True:
+            await asyncio.sleep(EVENTS_PING_INTERVAL)
+            self.broadcast(b": ping\n\n")
+
+    async def event_heartbeats(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(EVENTS_HEARTBEAT_INTERVAL)
+            sessions = set(self.event_clients.values())
+            if not sessions:
+                continue
+            try:
+                await loop.run_in_executor(self.db_executor, analytics.handle_heartbeats, sessions)
+            except Exception as e:
+                print(f"[meridian] stream heartbeats failed: {e}", file=sys.stderr)
+
+    # ── Push channel ──────────────────────────────────────────────────────────
+
+    def feed_event(self, since):
+        """The feed as an SSE message; its id is the cursor, so a reconnect resumes with a delta."""
+        _etag, body, _packed = self.render_feed(since)
+        return sse_message("feed", body, self.feed_data.get("cursor"))
+
+    def broadcast(self, message):
+        """Queue one message on every open stream, dropping clients that stopped reading."""
+        for writer in list(self.event_clients):
+            if writer.is_closing():
+                continue
+            if writer.transport.get_write_buffer_size() > EVENTS_MAX_BUFFER:
+                writer.close()  # it reconnects with Last-Event-ID and gets a delta
+                continue
+            writer.write(message)
+
+    async def handle_events(self, req, reader, writer):
+        """Hold a Server-Sent Events stream open until the client disconnects."""
+        if req.method != "GET":
+            write_response(writer, 405, JSON_HEADERS,
+                           json_body({"status": "error", "error": "method_not_allowed"}), keep_alive=False)
+            return
+        if len(self.event_clients) >= EVENTS_MAX_CLIENTS:
+            write_response(writer, 503, JSON_HEADERS + [("Retry-After", "60")],
+                           json_body({"status": "error", "error": "too_many_streams"}), keep_alive=False)
+            return
+        params = dict(parse_qsl(req.query))
+        await self.feed_ready.wait()
+        since = req.headers.get("last-event-id") or params.get("since")
+        lines = ["HTTP/1.1 200 OK"] + [f"{k}: {v}" for k, v in EVENTS_HEADERS]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        writer.write(f"retry: {EVENTS_RETRY_MS}\n\n".encode("latin-1"))
+        writer.write(self.feed_event(since))
+        if self.summary_body is not None:
+            writer.write(sse_message("summary", self.summary_body))
+        self.count_metric("hit")
+        self.event_clients[writer] = params.get("session_id", "")[:64]
+        try:
+            await writer.drain()
+            # Clients send nothing after the request; EOF means they left
+            while await reader.read(4096):
+                pass
+        finally:
+            self.event_clients.pop(writer, None)
+
+    async def handle_export(self, req, writer):
+        """Stream an analytics export as chunked output, then close the connection."""
+        loop = asyncio.get_running_loop()
+        # The export's SQLite connections belong to the thread that opened
+        # them, so every chunk is read on this one.
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="export")
+        chunks = None
+        try:
+            try:
+                content_type, filename, chunks = await loop.run_in_executor(
+                    executor, analytics.handle_export, analytics.parse_qs(req.query))
+                chunk = await loop.run_in_executor(executor, next, chunks, b"")
+            except Exception as e:
+                status = 403 if isinstance(e, PermissionError) else 400 if isinstance(e, ValueError) else 500
+                write_response(writer, status, JSON_HEADERS,
+                               json_body({"status": "error", "error": str(e)}), keep_alive=False)
+                await writer.drain()
+                return
+            headers = [("Content-Type", content_type),
+                       ("Content-Disposition", f'attachment; filename="{filename}"')] + EXPORT_HEADERS
+            lines = ["HTTP/1.1 200 OK"] + [f"{k}: {v}" for k, v in headers]
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+            while chunk:
+                writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                await writer.drain()  # backpressure: a slow client slows the reads
+                chunk = await loop.run_in_executor(executor, next, chunks, b"")
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        finally:
+            if chunks is not None:
+                await loop.run_in_executor(executor, chunks.close)
+            executor.shutdown(wait=False)
+
+    # ── Routes ────────────────────────────────────────────────────────────────
+
+    async def handle_feed(self, req):
+        if req.method == "OPTIONS":
+            return 200, FEED_HEADERS, b""
+        if req.method not in ("GET", "HEAD"):
+            return 405, JSON_HEADERS, json_body({"status": "error", "error": "method_not_allowed"})
+        params = dict(parse_qsl(req.query))
+        if params.get("action") == "metrics":
+            return 200, METRICS_HEADERS, (await asyncio.to_thread(feed.render_metrics, dict(self.metric_counts))).encode("utf-8")
+        if params.get("action") == "search":
+            try:
+                result = await asyncio.to_thread(feed.search_archive, params)
+            except Exception as e:
+                result = {"status": "error", "error": str(e)}
+            return 200, JSON_HEADERS, json_body(result)
+
+        await self.feed_ready.wait()
+        since = params.get("since")
+        etag, body, packed = self.render_feed(since)
+        headers = FEED_HEADERS + [("Vary", "Accept-Encoding")]
+        if "gzip" in req.headers.get("accept-encoding", ""):
+            body = packed
+            etag = feed.gzip_etag(etag)
+            headers.append(("Content-Encoding", "gzip"))
+        headers.append(("ETag", etag))
+        self.count_metric("hit")  # served from memory; the refresher logs the counts
+        if feed.etag_matches(etag, req.headers.get("if-none-match")):
+            self.count_metric("not_modified")
+            return 304, headers, b""
+        return 200, headers, body
+
+    async def handle_analytics(self, req):
+        loop = asyncio.get_running_loop()
+        params = analytics.parse_qs(req.query)
+        try:
+            if req.method == "POST":
+                raw = req.body.decode("utf-8", errors="replace")
+                result = await loop.run_in_executor(self.db_executor, analytics.handle_post, raw)
+            elif req.method in ("GET", "HEAD"):
+                action = params.get("action", "summary")
+                if action == "heartbeat":
+                    result = await loop.run_in_executor(
+                        self.db_executor, analytics.handle_heartbeat, params.get("session_id", ""))
+                else:
+                    if self.summary_body is None:
+                        self.summary_body = json_body(
+                            await loop.run_in_executor(self.db_executor, analytics.handle_summary))
+                    return 200, JSON_HEADERS, self.summary_body
+            elif req.method == "OPTIONS":
+                headers = JSON_HEADERS + [
+                    ("Access-Control-Allow-Methods", "GET, POST, OPTIONS"),
+                    ("Access-Control-Allow-Headers", "Content-Type"),
+                ]
+                return 200, headers, json_body({"status": "ok"})
+            else:
+                result = {"status": "error", "error": f"method_not_allowed: {req.method}"}
+        except Exception as e:
+            result = {"status": "error", "error": str(e)}
+        return 200, JSON_HEADERS, json_body(result)
+
+    async def handle_static(self, req):
+        if req.method not in ("GET", "HEAD"):
+            return 405, [], b""
+        rel = req.path.lstrip("/") or "index.html"
+        if ("/" in rel or rel.startswith(".")
+                or not (rel in STATIC_FILES or rel.endswith(STATIC_SUFFIXES))):
+            return 404, [("Content-Type", "text/plain")], b"not found"
+        full = os.path.join(PROJECT_DIR, rel)
+        try:
+            with open(full, "rb") as f:
+                body = f.read()
+        except OSError:
+            return 404, [("Content-Type", "text/plain")], b"not found"
+        if os.path.basename(full) == "app.js":
+            body = body.replace(CGI_BIN_PLACEHOLDER, b"'/cgi-bin'")
+        ctype = mimetypes.guess_type(full)[0] or "application/octet-stream"
+        return 200, [("Content-Type", ctype)], body
+
+    async def dispatch(self, req):
+        if req.path == "/cgi-bin/feed.py":
+            return await self.handle_feed(req)
+        if req.path == "/cgi-bin/analytics.py":
+            return await self.handle_analytics(req)
+        if req.path.startswith("/cgi-bin/"):
+            return 404, [("Content-Type", "text/plain")], b"not found"
+        return await self.handle_static(req)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    parsed = await read_request(reader)
+                except ValueError:
+                    write_response(writer, 400, [], b"", keep_alive=False)
+                    break
+                if parsed is None:
+                    break
+                req, version = parsed
+                if req.path == EVENTS_PATH:
+                    await self.handle_events(req, reader, writer)
+                    break
+                if (req.path == "/cgi-bin/analytics.py" and req.method == "GET"
+                        and analytics.parse_qs(req.query).get("action") == "export"):
+                    await self.handle_export(req, writer)
+                    break
+                try:
+                    status, headers, body = await self.dispatch(req)
+                except Exception as e:
+                    print(f"[meridian] {req.method} {req.path} failed: {e}", file=sys.stderr)
+                    status, headers, body = 500, [], b""
+                keep_alive = (version == "HTTP/1.1"
+                              and req.headers.get("connection", "").lower() != "close")
+                write_response(writer, status, headers, body, keep_alive,
+                               head_only=req.method == "HEAD")
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        self.load_warm_cache()
+        tasks = [
+            asyncio.create_task(self.feed_refresher()),
+            asyncio.create_task(self.summary_refresher()),
+            asyncio.create_task(self.retention_runner()),
+            asyncio.create_task(self.event_pinger()),
+            asyncio.create_task(self.event_heartbeats()),
+        ]
+        raise_fd_limit()
+        server = await asyncio.start_server(self.handle_connection, host, port, backlog=LISTEN_BACKLOG)
+        print(f"[meridian] serving on http://{host}:{port}", file=sys.stderr)
+        async with server:
+            try:
+                await server.serve_forever()
+            finally:
+                for t in tasks:
+                    t.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MERIDIAN INTEL persistent server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    try:
+        asyncio.run(MeridianServer().serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()